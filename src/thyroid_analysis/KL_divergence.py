@@ -3,15 +3,17 @@
 import numpy as np
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import entropy
 
+from .instrumentation import instrument
+
+@instrument
 def calculate_kl_divergence(original, imputed, bins=20):
     """
     Calculate KL divergence between original and imputed data using histogram bins.
     Adds a small epsilon to avoid log(0).
     """
+    from scipy.stats import entropy
+
     original = original.dropna()
     imputed = imputed.dropna()
     if original.empty or imputed.empty:
@@ -28,35 +30,174 @@ def calculate_kl_divergence(original, imputed, bins=20):
 
     return entropy(orig_hist, imputed_hist)
 
-def compute_kl_for_all_features(df_original, df_knn, df_mice, columns):
+# =========== Batched divergence engine ===========
+
+EPSILON = 1e-10
+DIVERGENCES = ('kl', 'js', 'wasserstein')
+
+
+def stack_columns(frames: list, columns: list) -> np.ndarray:
+    """Stack the given columns of several frames into one (n_frames, n_rows, n_columns) float array, NaN-padded."""
+    n_rows = max(len(df) for df in frames)
+    stacked = np.full((len(frames), n_rows, len(columns)), np.nan)
+    for v, df in enumerate(frames):
+        stacked[v, :len(df)] = df[columns].to_numpy(dtype=float)
+    return stacked
+
+
+def shared_bin_ranges(stacked: np.ndarray):
     """
-    Compute KL divergence for each feature for both KNN and MICE.
-    Returns a DataFrame for plotting and export.
+    Per-column (low, high) over every variant, so all variants of a column share one
+    set of bin edges. Constant columns get numpy's +/-0.5 range.
+    """
+    with np.errstate(all='ignore'):
+        low = np.nanmin(stacked, axis=(0, 1))
+        high = np.nanmax(stacked, axis=(0, 1))
+    constant = low == high
+    low = np.where(constant, low - 0.5, low)
+    high = np.where(constant, high + 0.5, high)
+    return low, high
+
+
+def batched_histograms(stacked: np.ndarray, low: np.ndarray, high: np.ndarray, bins: int = 20) -> np.ndarray:
+    """
+    Histogram every column of every variant in one bincount.
+
+    Bin assignment follows np.histogram for uniform bins (last bin closed on the right).
+    Columns whose low/high are NaN (no data at all) get empty histograms.
+
+    Returns:
+    - np.ndarray: Counts of shape (n_variants, n_columns, bins)
+    """
+    n_variants, _, n_columns = stacked.shape
+    edges = np.linspace(low, high, bins + 1, axis=1)  # (n_columns, bins + 1)
+    valid = ~np.isnan(stacked) & ~np.isnan(low)
+    v_idx, _, c_idx = np.nonzero(valid)
+    x = stacked[valid]
+
+    with np.errstate(all='ignore'):
+        idx = ((x - low[c_idx]) * (bins / (high - low))[c_idx]).astype(np.intp)
+    idx = np.clip(idx, 0, bins - 1)
+    # Same edge corrections as np.histogram for values sitting on a computed edge
+    idx -= (x < edges[c_idx, idx]) & (idx > 0)
+    idx += (x >= edges[c_idx, idx + 1]) & (idx < bins - 1)
+
+    flat = (v_idx * n_columns + c_idx) * bins + idx
+    counts = np.bincount(flat, minlength=n_variants * n_columns * bins)
+    return counts.reshape(n_variants, n_columns, bins)
+
+
+def divergences_from_histograms(counts: np.ndarray, widths: np.ndarray, metrics=('kl',)) -> dict:
     """
-    kl_knn = []
-    kl_mice = []
+    Divergences of variants 1..n against variant 0, for every column at once.
 
-    for col in columns:
-        kl_knn.append(calculate_kl_divergence(df_original[col], df_knn[col]))
-        kl_mice.append(calculate_kl_divergence(df_original[col], df_mice[col]))
+    KL and JS use density histograms plus EPSILON (as calculate_kl_divergence does);
+    Wasserstein-1 is computed from the binned CDFs in the units of the data, so it is
+    an approximation at the histogram resolution.
+    A column with no data in either histogram scores 0.
 
+    Parameters:
+    - counts (np.ndarray): (n_variants, n_columns, bins) histogram counts
+    - widths (np.ndarray): (n_columns,) bin width per column
+    - metrics (tuple): Any of DIVERGENCES
+
+    Returns:
+    - dict: {metric: array of shape (n_variants - 1, n_columns)}
+    """
+    unknown = [m for m in metrics if m not in DIVERGENCES]
+    if unknown:
+        raise ValueError(f"Unknown divergences: {unknown}. Available: {list(DIVERGENCES)}")
+
+    totals = counts.sum(axis=2, keepdims=True)
+    empty = (totals[0] == 0) | (totals[1:] == 0)  # (n_variants - 1, n_columns, 1)
+    with np.errstate(all='ignore'):
+        density = counts / (totals * widths[None, :, None]) + EPSILON
+    prob = density / density.sum(axis=2, keepdims=True)
+    p, q = prob[:1], prob[1:]
+
+    results = {}
+    if 'kl' in metrics:
+        results['kl'] = np.sum(p * np.log(p / q), axis=2)
+    if 'js' in metrics:
+        m = 0.5 * (p + q)
+        results['js'] = 0.5 * np.sum(p * np.log(p / m), axis=2) + 0.5 * np.sum(q * np.log(q / m), axis=2)
+    if 'wasserstein' in metrics:
+        with np.errstate(all='ignore'):
+            mass = counts / totals
+        cdf_gap = np.abs(np.cumsum(mass[:1], axis=2) - np.cumsum(mass[1:], axis=2))
+        results['wasserstein'] = np.sum(cdf_gap, axis=2) * widths[None, :]
+    return {name: np.where(empty[..., 0], 0.0, values) for name, values in results.items()}
+
+
+def divergence_table(scores: dict, methods: list, columns: list) -> pd.DataFrame:
+    """Turn {metric: (n_methods, n_columns) array} into a tidy Feature/Method/Metric/Value table."""
+    rows = []
+    for metric, values in scores.items():
+        for v, method in enumerate(methods):
+            for c, col in enumerate(columns):
+                rows.append((col, method, metric, float(values[v, c])))
+    return pd.DataFrame(rows, columns=['Feature', 'Method', 'Metric', 'Value'])
+
+
+@instrument
+def compute_divergences(df_original: pd.DataFrame, imputed: dict, columns: list,
+                        bins: int = 20, metrics=('kl',)) -> pd.DataFrame:
+    """
+    Compare any number of imputed variants with the original data in one batched pass.
+
+    All frames are stacked into a single array, bin edges are computed once per
+    column across the original and every variant, and all histograms come from one
+    bincount.
+
+    Parameters:
+    - df_original (pd.DataFrame): Data before imputation (NaNs are ignored)
+    - imputed (dict): {method name: imputed DataFrame}
+    - columns (list): Features to compare
+    - bins (int): Histogram bins per feature
+    - metrics (tuple): Any of 'kl', 'js', 'wasserstein'
+
+    Returns:
+    - pd.DataFrame: Tidy table with columns Feature, Method, Metric, Value
+    """
+    methods = list(imputed)
+    stacked = stack_columns([df_original] + [imputed[m] for m in methods], columns)
+    low, high = shared_bin_ranges(stacked)
+    counts = batched_histograms(stacked, low, high, bins)
+    scores = divergences_from_histograms(counts, (high - low) / bins, metrics)
+    return divergence_table(scores, methods, columns)
+
+
+@instrument
+def compute_kl_for_all_features(df_original, df_knn, df_mice, columns, bins=20):
+    """
+    Compute KL divergence for each feature for both KNN and MICE.
+    Returns a DataFrame for plotting and export.
+    """
+    long = compute_divergences(df_original, {'KNN': df_knn, 'MICE': df_mice}, columns, bins=bins)
+    wide = long.pivot(index='Feature', columns='Method', values='Value').reindex(columns)
     return pd.DataFrame({
         'Feature': columns,
-        'KL(KNN)': kl_knn,
-        'KL(MICE)': kl_mice
+        'KL(KNN)': wide['KNN'].to_numpy(),
+        'KL(MICE)': wide['MICE'].to_numpy()
     })
 
+@instrument
 def plot_kl_divergence(kl_df, save_path="outputs/eda/imputed/kl_divergence_plot.png"):
     """
     Plot and save a bar chart of KL divergence values.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    from .rendering import PYPLOT_LOCK
+
     kl_long = kl_df.melt(id_vars='Feature', var_name='Method', value_name='KL Divergence')
-    plt.figure(figsize=(12, 6))
-    sns.barplot(data=kl_long, x='Feature', y='KL Divergence', hue='Method')
-    plt.xticks(rotation=45, ha='right')
-    plt.title("KL Divergence: KNN vs MICE Imputation")
-    plt.tight_layout()
     os.makedirs(os.path.dirname(save_path), exist_ok=True)
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+    with PYPLOT_LOCK:
+        plt.figure(figsize=(12, 6))
+        sns.barplot(data=kl_long, x='Feature', y='KL Divergence', hue='Method')
+        plt.xticks(rotation=45, ha='right')
+        plt.title("KL Divergence: KNN vs MICE Imputation")
+        plt.tight_layout()
+        plt.savefig(save_path, dpi=300)
+        plt.close()
     print(f"📊 KL divergence plot saved to: {save_path}")
@@ -0,0 +1,9 @@
+# src/thyroid_analysis/benchmarks/__init__.py
+#
+#     python -m thyroid_analysis.benchmarks --sizes 1000 100000 --save-baseline
+#     python -m thyroid_analysis.benchmarks --sizes 1000 100000 --compare
+
+from .synthetic import make_synthetic_cohort
+from .suite import BENCHMARKS, run_suite, save_baseline, compare_to_baseline
+
+__all__ = ['make_synthetic_cohort', 'BENCHMARKS', 'run_suite', 'save_baseline', 'compare_to_baseline']
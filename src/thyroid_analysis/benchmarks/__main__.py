@@ -0,0 +1,43 @@
+# src/thyroid_analysis/benchmarks/__main__.py
+
+import argparse
+import sys
+
+from .suite import (BENCHMARKS, DEFAULT_BASELINE_PATH, DEFAULT_SIZES, compare_to_baseline,
+                    run_suite, save_baseline)
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the thyroid analysis stages on synthetic cohorts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="Cohort sizes in rows, e.g. 1000 10000 10000000")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--missingness", type=float, default=None,
+                        help="Missing rate for every lab column (default: the real cohort's rates)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Categorical text columns and float labs (use for 10M rows)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--imports", action="store_true", help="Also measure cold import times")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.benchmarks, args.repeat, args.missingness, args.compact,
+                        args.seed, args.imports)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    if args.compare:
+        comparison = compare_to_baseline(results, args.baseline, args.tolerance)
+        print(comparison.to_string(index=False))
+        if comparison['regression'].any():
+            print(f"❌ {int(comparison['regression'].sum())} benchmark(s) regressed beyond {args.tolerance:.0%}")
+            return 1
+        print("✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
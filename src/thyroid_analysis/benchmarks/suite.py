@@ -0,0 +1,217 @@
+# src/thyroid_analysis/benchmarks/suite.py
+#
+# Times the analysis stages on synthetic cohorts of growing size, records peak traced
+# memory, and compares a run against a stored baseline to catch regressions.
+
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .synthetic import make_synthetic_cohort
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+DEFAULT_BASELINE_PATH = "outputs/benchmarks/baseline.json"
+
+COMPARE_COLUMNS = ['Age', 'first TSH', 'last TSH', 'first T3', 'last T3', 'first T4', 'last T4',
+                   'first FT4', 'last FT4', 'first FT3', 'last FT3']
+
+
+@dataclass
+class Benchmark:
+    """
+    One timed stage.
+
+    - setup: cohort (raw synthetic frame) -> inputs; not timed
+    - run: inputs -> anything; timed
+    - max_rows: Larger sizes are skipped (stages that are quadratic or plot every row)
+    """
+    setup: object
+    run: object
+    max_rows: int = None
+
+
+def _clean(raw):
+    from ..preprocessing import PreprocessingPlan
+    return PreprocessingPlan(verbose=0).fit_transform(raw)
+
+
+def _filled(raw):
+    """Compared columns before/after a median fill, a cheap stand-in for an imputed frame."""
+    df = _clean(raw)[COMPARE_COLUMNS + ['Diagnostic Group Code']]
+    return df, df.fillna(df[COMPARE_COLUMNS].median())
+
+
+def _run_kl(inputs):
+    from ..KL_divergence import compute_divergences
+    df, df_filled = inputs
+    return compute_divergences(df, {'Median': df_filled}, COMPARE_COLUMNS, metrics=('kl', 'js'))
+
+
+def _selection_inputs(raw):
+    df = _filled(raw)[1].dropna(subset=['Diagnostic Group Code'])
+    return df, df['Diagnostic Group Code'].astype(int)
+
+
+def _run_selection(inputs):
+    from ..feature_selection import clear_selection_cache, select_features_consensus
+    X, y = inputs
+    clear_selection_cache()
+    return select_features_consensus(X, y, COMPARE_COLUMNS, n_jobs=1)
+
+
+def _run_imputation(df):
+    from ..imputation import run_imputers
+    return run_imputers(df, imputers=['knn_blockwise', 'mice'], n_jobs=1, verbose=False)
+
+
+def _run_eda(df):
+    from ..eda import categorical_figure_specs, numerical_figure_specs
+    from ..rendering import render_figures
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        specs = categorical_figure_specs(df, ['Sex', 'Smoking', 'Marital status'], out_dir)
+        specs += numerical_figure_specs(df, ['Age', 'first TSH', 'last T4'], out_dir)
+        return render_figures(specs, n_jobs=1, skip_unchanged=False)
+
+
+BENCHMARKS = {
+    'preprocessing': Benchmark(lambda raw: raw, _clean),
+    'kl_divergence': Benchmark(_filled, _run_kl),
+    'feature_selection': Benchmark(_selection_inputs, _run_selection, max_rows=100_000),
+    'imputation': Benchmark(_clean, _run_imputation, max_rows=10_000),
+    'eda': Benchmark(_clean, _run_eda, max_rows=100_000),
+}
+
+
+def _measure(benchmark: Benchmark, inputs, repeat: int) -> dict:
+    """Best-of-`repeat` wall time, then one extra traced run for the allocation peak."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        benchmark.run(inputs)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        benchmark.run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(times), 'median_seconds': float(np.median(times)), 'peak_mb': peak / 2**20}
+
+
+def run_suite(sizes=DEFAULT_SIZES, benchmarks: list = None, repeat: int = 3, missingness=None,
+              compact: bool = False, seed: int = 0, include_imports: bool = False,
+              verbose: bool = True) -> pd.DataFrame:
+    """
+    Time each benchmark on synthetic cohorts of each size.
+
+    Parameters:
+    - sizes (tuple): Cohort sizes in rows (the real workbook has 5,553)
+    - benchmarks (list): Names from BENCHMARKS (default: all)
+    - repeat (int): Timed runs per size; the fastest is reported
+    - missingness (None | float | dict): Passed to make_synthetic_cohort
+    - compact (bool): Categorical text columns and float labs (see make_synthetic_cohort);
+      needed for 10M-row cohorts on machines with a few GB of memory
+    - seed (int): Cohort seed
+    - include_imports (bool): Also measure cold import times against utils.IMPORT_BUDGETS
+    - verbose (bool): Print one line per measurement
+
+    Returns:
+    - pd.DataFrame: benchmark, rows, seconds (best), median_seconds, peak_mb
+      (peak traced allocation during one run), rows_per_second
+    """
+    from .. import config
+    config.suppress_warnings()
+
+    names = list(benchmarks or BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {unknown}. Available: {list(BENCHMARKS)}")
+
+    records = []
+    for n_rows in sizes:
+        raw = make_synthetic_cohort(n_rows, missingness=missingness, compact=compact, seed=seed)
+        for name in names:
+            benchmark = BENCHMARKS[name]
+            if benchmark.max_rows and n_rows > benchmark.max_rows:
+                continue
+            try:
+                result = _measure(benchmark, benchmark.setup(raw), repeat)
+            except MemoryError:
+                print(f"⚠️ {name} ran out of memory at {n_rows:,} rows")
+                continue
+            record = {'benchmark': name, 'rows': n_rows, **result,
+                      'rows_per_second': n_rows / result['seconds'] if result['seconds'] else float('inf')}
+            records.append(record)
+            if verbose:
+                print(f"⏱️ {name:<18} {n_rows:>10,} rows: {result['seconds']:8.3f}s "
+                      f"peak {result['peak_mb']:8.1f} MB")
+        del raw
+
+    if include_imports:
+        from ..utils import IMPORT_BUDGETS, measure_import_time
+        for module, budget in IMPORT_BUDGETS.items():
+            seconds = measure_import_time(module)
+            records.append({'benchmark': f"import:{module}", 'rows': 0, 'seconds': seconds,
+                            'median_seconds': seconds, 'peak_mb': float('nan'), 'rows_per_second': float('nan')})
+            if verbose:
+                flag = "✅" if seconds <= budget else "❌"
+                print(f"{flag} import {module}: {seconds:.3f}s (budget {budget:.3f}s)")
+    return pd.DataFrame(records)
+
+
+def save_baseline(results: pd.DataFrame, path: str = DEFAULT_BASELINE_PATH) -> str:
+    """Store a run as the baseline, with the machine it was measured on."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count()},
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'results': json.loads(results.to_json(orient='records')),
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"💾 Saved benchmark baseline to: {path}")
+    return path
+
+
+def compare_to_baseline(results: pd.DataFrame, path: str = DEFAULT_BASELINE_PATH, tolerance: float = 0.25,
+                        min_seconds: float = 0.05) -> pd.DataFrame:
+    """
+    Compare a run with the stored baseline.
+
+    Parameters:
+    - results (pd.DataFrame): Output of run_suite
+    - path (str): Baseline written by save_baseline
+    - tolerance (float): Allowed relative slowdown / memory growth (0.25 = 25%)
+    - min_seconds (float): Timings below this are too noisy to flag
+
+    Returns:
+    - pd.DataFrame: Matching benchmark/rows pairs with baseline values, time_ratio,
+      memory_ratio and a regression flag
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"No benchmark baseline at {path}; create one with save_baseline()")
+    with open(path) as f:
+        baseline = pd.DataFrame(json.load(f)['results'])
+
+    merged = results.merge(baseline[['benchmark', 'rows', 'seconds', 'peak_mb']],
+                           on=['benchmark', 'rows'], suffixes=('', '_baseline'))
+    merged['time_ratio'] = merged['seconds'] / merged['seconds_baseline']
+    merged['memory_ratio'] = merged['peak_mb'] / merged['peak_mb_baseline']
+    slower = (merged['time_ratio'] > 1 + tolerance) & (merged['seconds'] > min_seconds)
+    bigger = merged['memory_ratio'] > 1 + tolerance
+    merged['regression'] = slower | bigger.fillna(False)
+    return merged[['benchmark', 'rows', 'seconds', 'seconds_baseline', 'time_ratio',
+                   'peak_mb', 'peak_mb_baseline', 'memory_ratio', 'regression']]
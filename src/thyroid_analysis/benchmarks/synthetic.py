@@ -0,0 +1,149 @@
+# src/thyroid_analysis/benchmarks/synthetic.py
+#
+# Synthetic thyroid cohorts with the raw workbook's schema, for benchmarking at sizes
+# the real file cannot provide. Distributions are rough fits to the real cohort
+# (lab medians/spreads, category shares, per-column missing rates); nothing is copied
+# from patient records.
+
+import numpy as np
+import pandas as pd
+
+from ..diagnostic_mapping import DiagnosisMapper, diagnostic_mapping
+from ..preprocessing import LAB_COLUMNS
+
+# Share of missing values per column in data/ExactRealDatasetLU.xlsx
+REAL_MISSING_RATES = {
+    'Occupation': 0.001, 'Smoking': 0.031, 'Marital status': 0.003, 'Indication': 0.047,
+    'first TSH': 0.106, 'last TSH': 0.487, 'first T4': 0.633, 'last T4': 0.86,
+    'first T3': 0.67, 'last T3': 0.872, 'first FT4': 0.687, 'last FT4': 0.733,
+    'first FT3': 0.753, 'last FT3': 0.754,
+}
+
+# Lab distributions: (median, log-scale spread); TSH is skewed, hormones less so
+LAB_DISTRIBUTIONS = {
+    'TSH': (0.5, 1.6), 'T4': (100.0, 0.4), 'T3': (2.1, 0.45), 'FT4': (15.5, 0.35), 'FT3': (5.1, 0.4),
+}
+
+# Multiplicative shift of each lab per diagnostic group, so selectors have signal to find
+GROUP_EFFECTS = {
+    'Hyperthyroidism': {'TSH': 0.05, 'T4': 1.6, 'T3': 1.8, 'FT4': 1.7, 'FT3': 1.8},
+    'Hypothyroidism': {'TSH': 8.0, 'T4': 0.6, 'T3': 0.8, 'FT4': 0.6, 'FT3': 0.8},
+}
+
+# Text the workbook has in lab cells ('<0.01', line breaks, typos); coerced to NaN
+LAB_TEXT_TOKENS = ['<0.01', '0.005\n0.005', '6612?', ',0.005', '>100']
+
+# Share of rows diagnosed 'No Disease' (the most common single Dx in the real cohort)
+NO_DISEASE_SHARE = 0.31
+
+# Diagnoses that name no thyroid function state and so map to no group
+# (about 12% of real rows)
+UNMAPPED_DX = [
+    'Diagnostic', 'Multinodular Goiter (MNG)', 'Papillary Thyroid Carcinoma (PTC)',
+    'Suspicious Thyroid Nodule', 'Thyroid Nodule',
+]
+
+RAW_COLUMNS = ['Info.ID', 'Name', 'Age', 'Sex', 'Occupation', 'Smoking', 'Marital status'] + \
+    LAB_COLUMNS + ['Dx', 'Indication']
+
+CATEGORY_SHARES = {
+    'Sex': {'Female': 0.816, 'Male': 0.184},
+    'Smoking': {'No': 0.73, 'Passive': 0.185, 'Active': 0.068, 'Unknown ': 0.01, 'past Smoker': 0.007},
+    'Marital status': {'married': 0.71, 'Married': 0.2, 'Single': 0.082, 'Widow': 0.005, 'divorced': 0.003},
+    'Occupation': {'House wife': 0.66, 'Worker': 0.095, 'Employed': 0.06, 'teacher': 0.055,
+                   'Student': 0.035, 'jobless': 0.025, 'Retired': 0.07},
+    'Indication': {'MNG, Hyperthyroidism': 0.3, 'PTC': 0.25, 'Hyperthyroidism': 0.2, 'MNG': 0.15,
+                   'susp. Rt lobe nodule': 0.1},
+}
+
+
+def _choice_codes(rng, shares: dict, n: int) -> np.ndarray:
+    p = np.array(list(shares.values()), dtype=float)
+    return rng.choice(len(p), size=n, p=p / p.sum()).astype(np.int16)
+
+
+def _missing_rates(missingness) -> dict:
+    if missingness is None:
+        return dict(REAL_MISSING_RATES)
+    if isinstance(missingness, (int, float)):
+        return {**REAL_MISSING_RATES, **{col: float(missingness) for col in LAB_COLUMNS}}
+    return {**REAL_MISSING_RATES, **missingness}
+
+
+def make_synthetic_cohort(n_rows: int, missingness=None, unmapped_rate: float = 0.12,
+                          lab_text_rate: float = 0.002, compact: bool = False, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a raw cohort with the workbook's 19 columns.
+
+    Parameters:
+    - n_rows (int): Number of patients
+    - missingness (None | float | dict): None uses the real per-column missing rates;
+      a float sets every lab column to that rate; a dict overrides rates per column.
+      Values are missing completely at random.
+    - unmapped_rate (float): Share of Dx values that map to no diagnostic group
+    - lab_text_rate (float): Share of lab cells holding text such as '<0.01'. With 0 the
+      lab columns are plain float64; otherwise they are object columns like the workbook's.
+    - compact (bool): Text columns as pandas Categoricals and labs as float64 (no text
+      cells). Same values, a fraction of the memory: use it for cohorts of millions of rows.
+    - seed (int): Random seed
+
+    Returns:
+    - pd.DataFrame: Raw cohort, ready for PreprocessingPlan
+    """
+    rng = np.random.default_rng(seed)
+    rates = _missing_rates(missingness)
+
+    # Text columns are drawn as integer codes into a label list (-1 = missing) and only
+    # turned into strings at the end, so large cohorts never hash millions of Python strings
+    mapped = [dx for dx in diagnostic_mapping if dx != 'No Disease']
+    dx_labels = mapped + ['No Disease'] + UNMAPPED_DX
+    draw = rng.random(n_rows)
+    dx_codes = rng.integers(len(mapped), size=n_rows, dtype=np.int16)
+    dx_codes[(draw >= unmapped_rate) & (draw < unmapped_rate + NO_DISEASE_SHARE)] = len(mapped)
+    is_unmapped = draw < unmapped_rate
+    dx_codes[is_unmapped] = len(mapped) + 1 + rng.integers(len(UNMAPPED_DX), size=is_unmapped.sum())
+    label_groups = np.array([DiagnosisMapper().classify(dx) for dx in dx_labels], dtype=object)
+
+    # Names are dropped by preprocessing; a fixed pool keeps 10M-row cohorts small
+    text = {
+        'Name': ([f"Patient {i}" for i in range(1000)], rng.integers(1000, size=n_rows, dtype=np.int16)),
+        'Dx': (dx_labels, dx_codes),
+    }
+    for col, shares in CATEGORY_SHARES.items():
+        text[col] = (list(shares), _choice_codes(rng, shares, n_rows))
+
+    columns = {
+        'Info.ID': rng.permutation(n_rows) + 10_000,
+        'Age': np.clip(rng.normal(45, 12.7, n_rows).round(), 22, 68).astype(np.int64),
+    }
+    for col in LAB_COLUMNS:
+        analyte = col.split()[1]
+        median, spread = LAB_DISTRIBUTIONS[analyte]
+        values = median * np.exp(rng.normal(0, spread, n_rows))
+        for group, effects in GROUP_EFFECTS.items():
+            values[np.isin(dx_codes, np.flatnonzero(label_groups == group))] *= effects[analyte]
+        columns[col] = values.round(3)
+
+    for col, rate in rates.items():
+        if rate <= 0:
+            continue
+        missing = rng.random(n_rows) < rate
+        if col in text:
+            text[col][1][missing] = -1
+        elif col in columns:
+            columns[col][missing] = np.nan
+
+    if lab_text_rate and not compact:
+        tokens = np.array(LAB_TEXT_TOKENS, dtype=object)
+        for col in LAB_COLUMNS:
+            values = columns[col].astype(object)
+            is_text = rng.random(n_rows) < lab_text_rate
+            values[is_text] = tokens[rng.integers(len(tokens), size=is_text.sum())]
+            columns[col] = values
+
+    for col, (labels, codes) in text.items():
+        if compact:
+            columns[col] = pd.Categorical.from_codes(codes, categories=labels)
+        else:
+            columns[col] = np.append(np.array(labels, dtype=object), np.nan)[codes]
+    return pd.DataFrame({col: columns[col] for col in RAW_COLUMNS})
@@ -0,0 +1,139 @@
+# src/thyroid_analysis/charts.py
+#
+# Vega-Lite bar chart export from pre-aggregated counts. Earlier charts were
+# serialised from the full row-level frame (~1.9 MB each) only to draw a count
+# per category; here the counts are computed first, so a chart is a few KB, and
+# the charts of one export share a single long-form data blob.
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+from .instrumentation import instrument
+
+VEGA_LITE_SCHEMA = "https://vega.github.io/schema/vega-lite/v5.20.1.json"
+
+
+def aggregate_counts(df: pd.DataFrame, column: str) -> list:
+    """
+    Category counts of one column as long-form Vega-Lite records
+    {'column', 'category', 'count'} (missing values kept as a null category).
+    """
+    counts = df[column].value_counts(dropna=False, sort=False)
+    records = []
+    for value, count in counts.items():
+        if pd.isna(value):
+            value = None
+        elif hasattr(value, "item"):
+            value = value.item()
+        records.append({"column": column, "category": value, "count": int(count)})
+    return records
+
+
+def _data_name(records: list) -> str:
+    payload = json.dumps(records, sort_keys=True, separators=(",", ":"))
+    return "data-" + hashlib.md5(payload.encode()).hexdigest()
+
+
+def bar_chart_spec(column: str, data: dict) -> dict:
+    """
+    Vega-Lite count bar chart (sorted, scale-bound zoom) over long-form counts;
+    the chart keeps only its own column's rows, so one data source can feed every chart.
+    """
+    return {
+        "$schema": VEGA_LITE_SCHEMA,
+        "config": {"view": {"continuousWidth": 300, "continuousHeight": 300}},
+        "data": data,
+        "transform": [{"filter": {"field": "column", "equal": column}}],
+        "mark": {"type": "bar"},
+        "encoding": {
+            "x": {"field": "category", "type": "nominal", "sort": "-y", "title": column},
+            "y": {"field": "count", "type": "quantitative", "title": "Count of Records"},
+            "tooltip": [{"field": "category", "type": "nominal", "title": column},
+                        {"field": "count", "type": "quantitative"}],
+        },
+        "params": [{"name": "zoom", "select": {"type": "interval", "encodings": ["x", "y"]},
+                    "bind": "scales"}],
+        "title": f"Bar Chart of {column}",
+    }
+
+
+def prune_data_blobs(out_dir: str) -> list:
+    """
+    Delete the blobs in out_dir/data that no chart spec in out_dir refers to any more
+    (left behind when the data behind a chart changes). Returns the removed paths.
+    """
+    data_dir = os.path.join(out_dir, "data")
+    if not os.path.isdir(data_dir):
+        return []
+    referenced = set()
+    for entry in os.listdir(out_dir):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(out_dir, entry)) as f:
+                url = json.load(f).get("data", {}).get("url")
+        except (OSError, ValueError, AttributeError):
+            continue  # Not a chart spec
+        if url:
+            referenced.add(os.path.normpath(url))
+    removed = []
+    for entry in os.listdir(data_dir):
+        if entry.endswith(".json") and os.path.join("data", entry) not in referenced:
+            os.remove(os.path.join(data_dir, entry))
+            removed.append(os.path.join(data_dir, entry))
+    return removed
+
+
+@instrument
+def export_bar_charts(df: pd.DataFrame, columns: list, out_dir: str = "outputs/charts",
+                      inline: bool = False, filename: str = "{column}_barchart.json") -> dict:
+    """
+    Write one compact bar chart spec per column.
+
+    Parameters:
+    - df (pd.DataFrame): Source data (only the aggregated counts are written)
+    - columns (list): Columns to chart
+    - out_dir (str): Directory for chart specs
+    - inline (bool): Embed each chart's counts in its own spec (self-contained files).
+      Otherwise the counts of all columns go to one long-form blob,
+      out_dir/data/<content hash>.json, which every chart reads and filters to its
+      column; blobs no spec refers to any more are deleted.
+    - filename (str): Spec file name pattern
+
+    Returns:
+    - dict: {column: spec path}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {column: aggregate_counts(df, column) for column in columns}
+    if not inline:
+        records = [record for column in columns for record in counts[column]]
+        name = _data_name(records)
+        data_dir = os.path.join(out_dir, "data")
+        os.makedirs(data_dir, exist_ok=True)
+        blob = os.path.join(data_dir, f"{name}.json")
+        if not os.path.exists(blob):
+            with open(blob, "w") as f:
+                json.dump(records, f, separators=(",", ":"))
+
+    paths = {}
+    for column in columns:
+        if inline:
+            name = _data_name(counts[column])
+            spec = bar_chart_spec(column, {"name": name})
+            spec["datasets"] = {name: counts[column]}
+        else:
+            spec = bar_chart_spec(column, {"url": f"data/{name}.json"})
+
+        path = os.path.join(out_dir, filename.format(column=column))
+        with open(path, "w") as f:
+            json.dump(spec, f, separators=(",", ":"))
+        paths[column] = path
+        print(f"📊 Saved bar chart spec ({os.path.getsize(path)} bytes): {path}")
+    if not inline:
+        removed = prune_data_blobs(out_dir)
+        if removed:
+            print(f"🧹 Removed {len(removed)} chart data blobs no spec refers to")
+    return paths
@@ -1,62 +1,113 @@
 # src/thyroid_analysis/config.py
+#
+# Shared names for the analysis modules. Heavy backends (sklearn, boosting
+# libraries, plotting, statsmodels) are resolved lazily on first attribute access,
+# so `from thyroid_analysis import config` costs nothing until a name is used:
+#
+#     from thyroid_analysis import config
+#     model = config.XGBClassifier()   # xgboost is imported here, once
 
 # ========== Core Python ========== #
+import importlib
 import os
 import warnings
 from collections import Counter
 
-# ========== Data & Analysis ========== #
-import numpy as np
-import pandas as pd
-
-# ========== Visualization ========== #
-import matplotlib.pyplot as plt
-import seaborn as sns
-import missingno as msno
-from matplotlib_venn import venn3
-import altair as alt
-
-# ========== Machine Learning Models ========== #
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import (
-    RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
-)
-from xgboost import XGBClassifier
-from lightgbm import LGBMClassifier
-from catboost import CatBoostClassifier
-from sklearn.naive_bayes import GaussianNB
-from sklearn.svm import SVC
-from sklearn.neural_network import MLPClassifier
-
-# ========== Preprocessing & Feature Engineering ========== #
-from sklearn.preprocessing import StandardScaler
-from sklearn.impute import KNNImputer
-from sklearn.experimental import enable_iterative_imputer  # noqa
-from sklearn.impute import IterativeImputer
-from sklearn.decomposition import PCA
-from sklearn.feature_selection import RFE
-
-# ========== Imbalanced Data Handling ========== #
-from imblearn.over_sampling import SMOTE
-
-# ========== Model Evaluation & Metrics ========== #
-from sklearn.model_selection import (
-    train_test_split, StratifiedKFold, cross_val_predict, GridSearchCV
-)
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    roc_auc_score, cohen_kappa_score, confusion_matrix
-)
-
-# ========== Statistical Imputation ========== #
-from statsmodels.imputation import mice
-
-# ========== Google Colab ========== #
-try:
-    from google.colab import drive
-except ImportError:
-    drive = None  # Optional: If not running in Colab
-
-# ========== Suppress Warnings ========== #
-warnings.filterwarnings("ignore")
+# name -> (module, attribute); attribute None means the module itself
+_LAZY_IMPORTS = {
+    # ========== Data & Analysis ========== #
+    "np": ("numpy", None),
+    "pd": ("pandas", None),
+
+    # ========== Visualization ========== #
+    "plt": ("matplotlib.pyplot", None),
+    "sns": ("seaborn", None),
+    "msno": ("missingno", None),
+    "venn3": ("matplotlib_venn", "venn3"),
+    "alt": ("altair", None),
+
+    # ========== Machine Learning Models ========== #
+    "LogisticRegression": ("sklearn.linear_model", "LogisticRegression"),
+    "DecisionTreeClassifier": ("sklearn.tree", "DecisionTreeClassifier"),
+    "RandomForestClassifier": ("sklearn.ensemble", "RandomForestClassifier"),
+    "GradientBoostingClassifier": ("sklearn.ensemble", "GradientBoostingClassifier"),
+    "AdaBoostClassifier": ("sklearn.ensemble", "AdaBoostClassifier"),
+    "XGBClassifier": ("xgboost", "XGBClassifier"),
+    "LGBMClassifier": ("lightgbm", "LGBMClassifier"),
+    "CatBoostClassifier": ("catboost", "CatBoostClassifier"),
+    "GaussianNB": ("sklearn.naive_bayes", "GaussianNB"),
+    "SVC": ("sklearn.svm", "SVC"),
+    "MLPClassifier": ("sklearn.neural_network", "MLPClassifier"),
+
+    # ========== Preprocessing & Feature Engineering ========== #
+    "StandardScaler": ("sklearn.preprocessing", "StandardScaler"),
+    "KNNImputer": ("sklearn.impute", "KNNImputer"),
+    "enable_iterative_imputer": ("sklearn.experimental.enable_iterative_imputer", None),
+    "IterativeImputer": ("sklearn.impute", "IterativeImputer"),
+    "PCA": ("sklearn.decomposition", "PCA"),
+    "RFE": ("sklearn.feature_selection", "RFE"),
+
+    # ========== Imbalanced Data Handling ========== #
+    "SMOTE": ("imblearn.over_sampling", "SMOTE"),
+
+    # ========== Model Evaluation & Metrics ========== #
+    "train_test_split": ("sklearn.model_selection", "train_test_split"),
+    "StratifiedKFold": ("sklearn.model_selection", "StratifiedKFold"),
+    "cross_val_predict": ("sklearn.model_selection", "cross_val_predict"),
+    "GridSearchCV": ("sklearn.model_selection", "GridSearchCV"),
+    "accuracy_score": ("sklearn.metrics", "accuracy_score"),
+    "precision_score": ("sklearn.metrics", "precision_score"),
+    "recall_score": ("sklearn.metrics", "recall_score"),
+    "f1_score": ("sklearn.metrics", "f1_score"),
+    "roc_auc_score": ("sklearn.metrics", "roc_auc_score"),
+    "cohen_kappa_score": ("sklearn.metrics", "cohen_kappa_score"),
+    "confusion_matrix": ("sklearn.metrics", "confusion_matrix"),
+
+    # ========== Statistical Imputation ========== #
+    "mice": ("statsmodels.imputation", "mice"),
+
+    # ========== Google Colab ========== #
+    "drive": ("google.colab", "drive"),
+}
+
+# Modules that must be imported before the named entry can be resolved
+_PREREQUISITES = {
+    "IterativeImputer": "sklearn.experimental.enable_iterative_imputer",
+}
+
+# Entries that resolve to None instead of raising when their package is missing
+_OPTIONAL = {"drive"}  # Optional: If not running in Colab
+
+
+def load(name: str):
+    """
+    Resolve a registered name, importing its backend on first use.
+    The result is cached on the module, so later lookups are plain attribute reads.
+    """
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module 'thyroid_analysis.config' has no attribute '{name}'")
+    module_name, attribute = _LAZY_IMPORTS[name]
+    try:
+        if name in _PREREQUISITES:
+            importlib.import_module(_PREREQUISITES[name])
+        module = importlib.import_module(module_name)
+        value = module if attribute is None else getattr(module, attribute)
+    except ImportError:
+        if name not in _OPTIONAL:
+            raise
+        value = None
+    globals()[name] = value
+    return value
+
+
+def __getattr__(name: str):
+    return load(name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
+
+def suppress_warnings():
+    """Silence library warnings for notebook/CLI runs (previously done at import time)."""
+    warnings.filterwarnings("ignore")
@@ -1,10 +1,153 @@
+# src/thyroid_analysis/data_loader.py
+
+import hashlib
+import os
+
 import pandas as pd
 
-def load_excel_dataset(file_path: str, sheet_name: str = 'Sheet1') -> pd.DataFrame:
+from .instrumentation import instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None  # Optional: Without pyarrow the cache is disabled
+
+DEFAULT_CACHE_DIR = "outputs/cache/datasets"
+
+# Written into the Arrow schema metadata so mixed text/number columns come back as object columns
+_MIXED_COLUMNS_KEY = b"thyroid_analysis.mixed_columns"
+_NUMERIC_SIDECAR = "__numeric__"
+
+
+def _file_digest(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_prefix(file_path: str, sheet_name: str) -> str:
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return f"{stem}__{str(sheet_name).replace(' ', '_')}__"
+
+
+def _cache_path(file_path: str, sheet_name: str, cache_dir: str) -> str:
+    """Cache file name keyed on the workbook content hash, its mtime and the sheet."""
+    mtime_ns = os.stat(file_path).st_mtime_ns
+    key = hashlib.sha256(f"{_file_digest(file_path)}:{mtime_ns}:{sheet_name}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{_cache_prefix(file_path, sheet_name)}{key}.arrow")
+
+
+def _read_sheet(file_path: str, sheet_name: str) -> pd.DataFrame:
+    """Parse only the requested sheet of the workbook."""
+    with pd.ExcelFile(file_path) as workbook:
+        if sheet_name not in workbook.sheet_names:
+            raise ValueError(f"Sheet '{sheet_name}' not found in {file_path}. Available sheets: {workbook.sheet_names}")
+        return workbook.parse(sheet_name)
+
+
+def _write_cache(df: pd.DataFrame, path: str) -> None:
+    """
+    Store the frame as an uncompressed Arrow IPC file so it can be memory-mapped.
+
+    Object columns that mix text and numbers (e.g. lab values such as '<0.01' next to
+    floats) cannot be stored by Arrow as one column, so the numeric entries go to a
+    float sidecar column and the text entries stay in the original column. Both are
+    recombined into an object column on read.
+    """
+    to_store = df.copy()
+    mixed = []
+    for col in df.columns:
+        if df[col].dtype != object or df[col].dropna().map(type).nunique() <= 1:
+            continue
+        is_number = df[col].map(lambda v: isinstance(v, (int, float)) and not isinstance(v, bool))
+        to_store[col] = df[col].where(~is_number & df[col].notna(), None).astype(object)
+        to_store[_NUMERIC_SIDECAR + col] = pd.to_numeric(df[col].where(is_number), errors="coerce")
+        mixed.append(col)
+
+    table = pa.Table.from_pandas(to_store, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[_MIXED_COLUMNS_KEY] = "\x1f".join(mixed).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    feather.write_feather(table, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def _read_cache(path: str) -> pd.DataFrame:
+    table = feather.read_table(path, memory_map=True)
+    mixed = (table.schema.metadata or {}).get(_MIXED_COLUMNS_KEY, b"").decode()
+    df = table.to_pandas()
+    for col in filter(None, mixed.split("\x1f")):
+        numbers = df.pop(_NUMERIC_SIDECAR + col)
+        text = df[col].astype(object)
+        df[col] = text.where(text.notna(), numbers.astype(object))
+    return df
+
+
+def clear_dataset_cache(file_path: str = None, cache_dir: str = DEFAULT_CACHE_DIR) -> int:
+    """
+    Delete cached sheets. If file_path is given only that workbook's entries are removed.
+
+    Returns:
+    - int: Number of cache files deleted
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    prefix = os.path.splitext(os.path.basename(file_path))[0] + "__" if file_path else ""
+    removed = 0
+    for name in os.listdir(cache_dir):
+        if name.endswith(".arrow") and name.startswith(prefix):
+            os.remove(os.path.join(cache_dir, name))
+            removed += 1
+    return removed
+
+
+@instrument
+def load_excel_dataset(file_path: str, sheet_name: str = 'Sheet1', use_cache: bool = True,
+                       refresh: bool = False, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
     """
     Load a specified sheet from an Excel file.
+
+    Only the requested sheet is parsed. The parsed frame is cached as an Arrow file
+    keyed on the workbook's content hash and mtime, and later calls reload it
+    memory-mapped instead of going through openpyxl again. Editing or replacing the
+    workbook changes the key, which invalidates the old entry.
+
+    Parameters:
+    - file_path (str): Path to the Excel workbook
+    - sheet_name (str): Sheet to load
+    - use_cache (bool): Read from / write to the Arrow cache (ignored without pyarrow)
+    - refresh (bool): Re-parse the workbook and overwrite the cached entry
+    - cache_dir (str): Directory holding the cache files. A sheet Arrow cannot store is
+      returned uncached, with a warning
     """
-    sheets = pd.read_excel(file_path, sheet_name=None)
-    if sheet_name not in sheets:
-        raise ValueError(f"Sheet '{sheet_name}' not found in {file_path}. Available sheets: {list(sheets.keys())}")
-    return sheets[sheet_name]
+    if not use_cache or feather is None:
+        return _read_sheet(file_path, sheet_name)
+
+    path = _cache_path(file_path, sheet_name, cache_dir)
+    if os.path.exists(path) and not refresh:
+        return _read_cache(path)
+
+    df = _read_sheet(file_path, sheet_name)
+
+    # Drop stale entries for this workbook/sheet before writing the fresh one
+    if os.path.isdir(cache_dir):
+        prefix = _cache_prefix(file_path, sheet_name)
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix) and name.endswith(".arrow"):
+                os.remove(os.path.join(cache_dir, name))
+    try:
+        _write_cache(df, path)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as error:
+        # The sheet parsed fine; only caching it failed (a column type Arrow cannot store)
+        if os.path.exists(f"{path}.tmp"):
+            os.remove(f"{path}.tmp")
+        print(f"⚠️ Not caching {file_path}:{sheet_name}: {type(error).__name__}: {error}")
+    return df
@@ -0,0 +1,219 @@
+# src/thyroid_analysis/dataset_writer.py
+#
+# Typed binary outputs. Parquet/Feather keep the frame's dtypes (categoricals stay
+# categoricals, integer codes stay integers) so downstream jobs do not re-infer types
+# from CSV text, and both formats let readers select columns and filter rows at read time.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # Optional: write_dataset/read_dataset raise without pyarrow
+
+FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+# Written into the schema metadata: Arrow/Parquet only round-trip string categoricals,
+# so integer-coded ones (e.g. Sex with categories [1, 0]) are restored from here on read
+_CATEGORIES_KEY = b"thyroid_analysis.categories"
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet/Feather outputs (pip install pyarrow)")
+
+
+def _format(path: str, file_format: str = None) -> str:
+    if file_format:
+        return file_format
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Cannot infer the format of '{path}'. Use one of {list(FORMATS)} or pass file_format")
+    return FORMATS[suffix]
+
+
+@instrument
+def write_dataset(df: pd.DataFrame, path: str, file_format: str = None, compression: str = 'zstd',
+                  partition_cols: list = None, row_group_size: int = None) -> str:
+    """
+    Write a frame as Parquet or Feather with its dtypes preserved.
+
+    Parameters:
+    - df (pd.DataFrame): Frame to write (the index is not stored)
+    - path (str): Output file; for a partitioned Parquet dataset, the output directory
+    - file_format (str): 'parquet' or 'feather' (default: inferred from the suffix)
+    - compression (str): 'zstd', 'lz4', 'snappy' (Parquet only) or None
+    - partition_cols (list): Parquet only: write one hive-style directory per value
+      (e.g. Feature=first TSH/) so readers can skip whole partitions
+    - row_group_size (int): Parquet only: rows per row group (smaller groups allow
+      finer row skipping through the per-group min/max statistics)
+
+    Returns:
+    - str: The written path
+    """
+    _require_pyarrow()
+    file_format = _format(path, file_format)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    categories = {col: {'categories': df[col].cat.categories.tolist(), 'ordered': bool(df[col].cat.ordered)}
+                  for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)}
+    metadata = dict(table.schema.metadata or {})
+    metadata[_CATEGORIES_KEY] = json.dumps(categories, default=str).encode()
+    table = table.replace_schema_metadata(metadata)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if file_format == 'parquet':
+        if partition_cols:
+            pq.write_to_dataset(table, path, partition_cols=partition_cols, compression=compression,
+                                existing_data_behavior='delete_matching')
+        else:
+            pq.write_table(table, path, compression=compression, row_group_size=row_group_size)
+    elif file_format == 'feather':
+        if partition_cols:
+            raise ValueError("Partitioning is only supported for Parquet outputs")
+        feather.write_feather(table, path, compression=compression or 'uncompressed')
+    else:
+        raise ValueError(f"Unknown format '{file_format}'. Available: ['parquet', 'feather']")
+
+    print(f"💾 Saved {df.shape[0]}x{df.shape[1]} {file_format} dataset to: {path}")
+    return path
+
+
+@instrument
+def read_dataset(path: str, columns: list = None, filters: list = None, file_format: str = None) -> pd.DataFrame:
+    """
+    Read a dataset written by write_dataset, optionally only some columns and rows.
+
+    Parameters:
+    - path (str): File or partitioned directory
+    - columns (list): Columns to load (default: all)
+    - filters (list): Row filters as (column, op, value) tuples, ANDed together,
+      e.g. [('Feature', '==', 'first TSH'), ('Was Missing', '==', True)].
+      Parquet skips row groups and partitions that cannot match.
+    - file_format (str): 'parquet' or 'feather' (default: inferred; directories are Parquet)
+
+    Returns:
+    - pd.DataFrame
+    """
+    _require_pyarrow()
+    if file_format is None:
+        file_format = 'parquet' if os.path.isdir(path) else _format(path)
+    if file_format == 'parquet':
+        table = pq.read_table(path, columns=columns, filters=filters)
+    else:
+        expression = pq.filters_to_expression(filters) if filters else None
+        table = ds.dataset(path, format='feather').to_table(columns=columns, filter=expression)
+
+    categories = json.loads((table.schema.metadata or {}).get(_CATEGORIES_KEY, b"{}"))
+    df = table.to_pandas()
+    for col, dtype in categories.items():
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(pd.CategoricalDtype(dtype['categories'], dtype['ordered']))
+    return df
+
+
+def iter_comparison(df_original: pd.DataFrame, imputed: dict, columns: list):
+    """
+    Yield the comparison_long table one feature at a time, built from that feature's
+    column arrays only, so the full long table never has to exist in memory.
+
+    Parameters: as comparison_long
+
+    Yields:
+    - pd.DataFrame: Rows of one feature (Feature keeps every feature as a category, so
+      the chunks share one schema)
+    """
+    methods = ['Original'] + list(imputed)
+    frames = [df_original] + list(imputed.values())
+    n_rows = len(df_original)
+    rows = np.tile(np.arange(n_rows, dtype=np.int32), len(methods))
+    method_codes = np.repeat(np.arange(len(methods)), n_rows)
+
+    for i, column in enumerate(columns):
+        values = np.concatenate([frame[column].to_numpy(dtype=float) for frame in frames])
+        was_missing = np.tile(np.isnan(values[:n_rows]), len(methods))
+        yield pd.DataFrame({
+            'Row': rows,
+            'Feature': pd.Categorical.from_codes(np.full(len(values), i), categories=list(columns)),
+            'Method': pd.Categorical.from_codes(method_codes, categories=methods),
+            'Value': values,
+            'Was Missing': was_missing,
+        })
+
+
+@instrument
+def comparison_long(df_original: pd.DataFrame, imputed: dict, columns: list) -> pd.DataFrame:
+    """
+    Original and imputed values in long (tidy) form instead of one wide column per
+    feature/method pair.
+
+    Parameters:
+    - df_original (pd.DataFrame): Frame before imputation
+    - imputed (dict): {method label: imputed frame}, e.g. {'KNN': df_knn, 'MICE': df_mice}
+    - columns (list): Features to compare
+
+    Returns:
+    - pd.DataFrame: Columns Row (position in the original frame), Feature and Method
+      (categoricals), Value (float) and Was Missing (whether the original cell was NaN),
+      sorted by Feature, Method and Row
+    """
+    return pd.concat(iter_comparison(df_original, imputed, columns), ignore_index=True)
+
+
+@instrument
+def write_comparison(df_original: pd.DataFrame, imputed: dict, columns: list, path: str,
+                     compression: str = 'zstd') -> str:
+    """
+    Write the comparison_long table to Parquet one feature per row group, without
+    building the table in memory. read_dataset(path, filters=[('Feature', '==', ...)])
+    then reads back single features.
+
+    Parameters:
+    - df_original, imputed, columns: as comparison_long
+    - path (str): Output .parquet file
+    - compression (str): Parquet compression codec
+
+    Returns:
+    - str: The written path
+    """
+    _require_pyarrow()
+    if _format(path) != 'parquet':
+        raise ValueError(f"write_comparison writes Parquet only, got '{path}'")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    writer, n_rows = None, 0
+    try:
+        for chunk in iter_comparison(df_original, imputed, columns):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                categories = {col: {'categories': chunk[col].cat.categories.tolist(), 'ordered': False}
+                              for col in ('Feature', 'Method')}
+                metadata = dict(table.schema.metadata or {})
+                metadata[_CATEGORIES_KEY] = json.dumps(categories, default=str).encode()
+                schema = table.schema.with_metadata(metadata)
+                writer = pq.ParquetWriter(path, schema, compression=compression)
+            writer.write_table(table.cast(schema))
+            n_rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"💾 Saved {n_rows}x5 parquet comparison ({len(columns)} features) to: {path}")
+    return path
+
+
+@instrument
+def comparison_wide(long_df: pd.DataFrame) -> pd.DataFrame:
+    """Pivot a comparison_long table (or a filtered read of one) back to '<feature> <method>' columns."""
+    wide = long_df.pivot_table(index='Row', columns=['Feature', 'Method'], values='Value',
+                               observed=True, dropna=False, aggfunc='first')
+    wide.columns = [f"{feature} {method}" for feature, method in wide.columns]
+    return wide
@@ -1,5 +1,8 @@
 # src/thyroid_analysis/diagnostic_mapping.py
 
+import difflib
+import re
+
 # Mapping raw diagnosis text to simplified diagnostic groups
 diagnostic_mapping = {
     'No Disease': 'No Disease',
@@ -50,3 +53,105 @@ diagnostic_group_mapping = {
     'Euthyroid': 2,
     'Hypothyroidism': 3
 }
+
+# Fallback rules for diagnosis text with no literal entry above, tried on each comma-separated
+# term of the normalised text. A value is assigned a group only when its terms agree.
+FALLBACK_RULES = [
+    ('Hyperthyroidism', r"\bhyper\s*thyroid|\bhyper\b|\bgra[vc]i?e?'?s\b"),  # not hyperparathyroidism
+    ('Hypothyroidism', r'\bhypo\s*thyroid|\bhypo\b'),                      # not hypoparathyroidism
+    ('Euthyroid', r'\beu\s*thyroid'),
+    ('No Disease', r'^no\s+disease$'),
+]
+
+# Terms no rule matched are split into words and compared with these spellings, so typos
+# such as 'hyeprthyroid' still resolve. The cutoff keeps hyper/hypoparathyroidism
+# (similarity ~0.88) apart from the thyroid terms.
+FALLBACK_TOKENS = {
+    'hyperthyroid': 'Hyperthyroidism', 'hyperthyroidism': 'Hyperthyroidism',
+    'hypothyroid': 'Hypothyroidism', 'hypothyroidism': 'Hypothyroidism',
+    'euthyroid': 'Euthyroid',
+}
+TOKEN_CUTOFF = 0.9
+
+
+def normalize_diagnosis(text) -> str:
+    """Lower-case, collapse whitespace and tidy the separators of a raw diagnosis value."""
+    text = re.sub(r'\s+', ' ', str(text)).strip().lower()
+    return re.sub(r'\s*,\s*', ', ', text)
+
+
+class DiagnosisMapper:
+    """
+    Maps raw diagnosis text to diagnostic groups.
+
+    Every distinct value is normalised and classified once: first against the literal
+    mapping (compared on normalised text, so spacing/case variants match), then by the
+    fallback rules. Series are mapped through their categories, so the cost depends on
+    the number of distinct diagnoses, not on the number of rows.
+
+    Parameters:
+    - mapping (dict): Literal {diagnosis: group} entries (default: diagnostic_mapping)
+    - rules (list): (group, regex) fallback rules (default: FALLBACK_RULES)
+    - tokens (dict): {spelling: group} for near-miss word matching (default: FALLBACK_TOKENS)
+    - fallback (bool): False restricts mapping to the literal entries
+    """
+
+    def __init__(self, mapping: dict = None, rules: list = None, tokens: dict = None, fallback: bool = True):
+        self.mapping = dict(mapping or diagnostic_mapping)
+        self.rules = list(FALLBACK_RULES if rules is None else rules)
+        self.tokens = dict(FALLBACK_TOKENS if tokens is None else tokens)
+        self.fallback = fallback
+        self._literal = {normalize_diagnosis(text): group for text, group in self.mapping.items()}
+        self._compiled = [(group, re.compile(pattern)) for group, pattern in self.rules]
+        self._cache = {}
+
+    def classify(self, text):
+        """Group of one raw diagnosis value, or None when it cannot be assigned."""
+        if text in self._cache:
+            return self._cache[text]
+        group = None
+        if isinstance(text, str):
+            normalized = normalize_diagnosis(text)
+            group = self._literal.get(normalized)
+            if group is None and self.fallback:
+                groups = set()
+                for term in normalized.split(', '):
+                    groups |= self._classify_term(term)
+                group = groups.pop() if len(groups) == 1 else None
+        self._cache[text] = group
+        return group
+
+    def _classify_term(self, term: str) -> set:
+        groups = {group for group, pattern in self._compiled if pattern.search(term)}
+        if not groups:
+            for word in re.findall(r'[a-z]+', term):
+                match = difflib.get_close_matches(word, self.tokens, n=1, cutoff=TOKEN_CUTOFF)
+                if match:
+                    groups.add(self.tokens[match[0]])
+        return groups
+
+    def map(self, values):
+        """Diagnostic group per row (NaN when unmapped)."""
+        values = values.astype('category')
+        return values.map({value: self.classify(value) for value in values.cat.categories})
+
+    def unmapped(self, values):
+        """Row counts of the raw values that map to no group (missing values included), largest first."""
+        import numpy as np
+        import pandas as pd
+
+        values = values.astype('category')
+        categories = values.cat.categories
+        counts = np.bincount(values.cat.codes.to_numpy() + 1, minlength=len(categories) + 1)
+        keep = [i for i, value in enumerate(categories) if self.classify(value) is None and counts[i + 1]]
+        result = pd.Series(counts[[i + 1 for i in keep]], index=categories[keep], dtype='int64', name='count')
+        if counts[0]:
+            result = pd.concat([result, pd.Series({np.nan: counts[0]}, name='count')])
+        return result.sort_values(ascending=False)
+
+    def __getstate__(self):
+        # Classifications are cheap to rebuild; keep pickled plans/bundles small
+        state = dict(self.__dict__)
+        state['_cache'] = {}
+        return state
+
@@ -0,0 +1,158 @@
+# src/thyroid_analysis/divergence_sketch.py
+#
+# Out-of-core version of KL_divergence.compute_divergences. Data is read in chunks
+# twice: the first pass builds mergeable per-feature range sketches, the second
+# fills mergeable histograms on the shared edges. Each sketch can be built on a
+# separate shard/worker and combined with `+`, and the final divergences equal the
+# in-memory engine's result.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .KL_divergence import (
+    batched_histograms, divergence_table, divergences_from_histograms, shared_bin_ranges
+)
+from .instrumentation import instrument
+from .utils import process_pool
+
+
+class RangeSketch:
+    """Per-feature min, max and non-missing count; mergeable across chunks and workers."""
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        self.low = np.full(len(self.columns), np.nan)
+        self.high = np.full(len(self.columns), np.nan)
+        self.count = np.zeros(len(self.columns), dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> "RangeSketch":
+        X = chunk[self.columns].to_numpy(dtype=float)
+        observed = ~np.isnan(X)
+        self.low = np.fmin(self.low, np.min(X, axis=0, initial=np.inf, where=observed))
+        self.high = np.fmax(self.high, np.max(X, axis=0, initial=-np.inf, where=observed))
+        self.low[np.isinf(self.low)] = np.nan
+        self.high[np.isinf(self.high)] = np.nan
+        self.count += (~np.isnan(X)).sum(axis=0)
+        return self
+
+    def __add__(self, other: "RangeSketch") -> "RangeSketch":
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge sketches over different columns")
+        merged = RangeSketch(self.columns)
+        merged.low = np.fmin(self.low, other.low)
+        merged.high = np.fmax(self.high, other.high)
+        merged.count = self.count + other.count
+        return merged
+
+
+class HistogramSketch:
+    """Per-feature counts on fixed uniform bins; mergeable by adding counts."""
+
+    def __init__(self, columns: list, low: np.ndarray, high: np.ndarray, bins: int = 20):
+        self.columns = list(columns)
+        self.low = np.asarray(low, dtype=float)
+        self.high = np.asarray(high, dtype=float)
+        self.bins = bins
+        self.counts = np.zeros((len(self.columns), bins), dtype=np.int64)
+
+    def update(self, chunk: pd.DataFrame) -> "HistogramSketch":
+        X = chunk[self.columns].to_numpy(dtype=float)[None]
+        self.counts += batched_histograms(X, self.low, self.high, self.bins)[0]
+        return self
+
+    def __add__(self, other: "HistogramSketch") -> "HistogramSketch":
+        if (other.columns != self.columns or other.bins != self.bins
+                or not np.array_equal(other.low, self.low, equal_nan=True)
+                or not np.array_equal(other.high, self.high, equal_nan=True)):
+            raise ValueError("Cannot merge histograms with different columns or bin edges")
+        merged = HistogramSketch(self.columns, self.low, self.high, self.bins)
+        merged.counts = self.counts + other.counts
+        return merged
+
+
+def iter_chunks(source, columns: list, chunksize: int = 100_000):
+    """
+    Yield DataFrame chunks holding `columns` from a CSV or Parquet path, or from a
+    callable returning an iterable of DataFrames (called again for every pass).
+    """
+    if callable(source):
+        yield from source()
+    elif str(source).endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, usecols=columns, chunksize=chunksize)
+
+
+@instrument
+def sketch_ranges(source, columns: list, chunksize: int = 100_000) -> RangeSketch:
+    sketch = RangeSketch(columns)
+    for chunk in iter_chunks(source, columns, chunksize):
+        sketch.update(chunk)
+    return sketch
+
+
+@instrument
+def sketch_histograms(source, columns: list, low, high, bins: int = 20,
+                      chunksize: int = 100_000) -> HistogramSketch:
+    sketch = HistogramSketch(columns, low, high, bins)
+    for chunk in iter_chunks(source, columns, chunksize):
+        sketch.update(chunk)
+    return sketch
+
+
+def _map(func, tasks: list, n_jobs: int):
+    if n_jobs <= 1 or any(callable(task[0]) for task in tasks):
+        return [func(*task) for task in tasks]
+    with process_pool(n_jobs) as pool:
+        return list(pool.map(func, *zip(*tasks)))
+
+
+@instrument
+def streaming_divergences(original, imputed: dict, columns: list, bins: int = 20,
+                          metrics=('kl',), chunksize: int = 100_000, n_jobs: int = None) -> pd.DataFrame:
+    """
+    Same result as KL_divergence.compute_divergences, without loading any dataset into memory.
+
+    Every source may be a single CSV/Parquet path, a list of shard paths, or a callable
+    returning an iterable of DataFrame chunks. Shards are sketched in parallel (paths
+    only) and merged per variant.
+
+    Parameters:
+    - original: Source for the data before imputation
+    - imputed (dict): {method name: source}
+    - columns (list): Features to compare
+    - bins (int): Histogram bins per feature
+    - metrics (tuple): Any of 'kl', 'js', 'wasserstein'
+    - chunksize (int): Rows per chunk
+    - n_jobs (int): Worker processes for path sources (default: CPU count)
+
+    Returns:
+    - pd.DataFrame: Tidy table with columns Feature, Method, Metric, Value
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    methods = list(imputed)
+    variants = [original] + [imputed[m] for m in methods]
+    shards = [source if isinstance(source, (list, tuple)) else [source] for source in variants]
+    owner = [v for v, group in enumerate(shards) for _ in group]
+    flat = [shard for group in shards for shard in group]
+
+    # Pass 1: ranges, merged across shards and variants into one set of shared edges
+    ranges = _map(sketch_ranges, [(shard, columns, chunksize) for shard in flat], n_jobs)
+    total = ranges[0]
+    for sketch in ranges[1:]:
+        total = total + sketch
+    bounds = np.stack([total.low, total.high])[:, None, :]
+    low, high = shared_bin_ranges(bounds)
+
+    # Pass 2: histograms on the shared edges, merged per variant
+    hists = _map(sketch_histograms, [(shard, columns, low, high, bins, chunksize) for shard in flat], n_jobs)
+    per_variant = [None] * len(variants)
+    for v, sketch in zip(owner, hists):
+        per_variant[v] = sketch if per_variant[v] is None else per_variant[v] + sketch
+    counts = np.stack([sketch.counts for sketch in per_variant])
+    scores = divergences_from_histograms(counts, (high - low) / bins, metrics)
+    return divergence_table(scores, methods, columns)
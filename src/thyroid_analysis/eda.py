@@ -2,11 +2,113 @@
 
 import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import missingno as msno
 
-def analyze_categorical_columns(df: pd.DataFrame, columns: list, show_plots: bool = True, save_dir: str = "outputs/eda"):
+from .rendering import FigureSpec, render_figures
+from .instrumentation import instrument
+
+# Columns left out of the missing-data matrix
+MISSING_PLOT_EXCLUDE = ['Diagnostic Group', 'Diagnostic Group Code']
+
+
+# =========== Drawing functions (used inline and by the rendering farm) ===========
+
+def _draw_bar_chart(data: pd.Series, column: str):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(12, 6))
+    sns.countplot(x=data)
+    plt.title(f'Bar Chart of {column}')
+    plt.xlabel(column)
+    plt.ylabel('Count')
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+
+def _draw_eda_plot(data: pd.Series, column: str):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(12, 5))
+
+    # Histogram
+    plt.subplot(1, 2, 1)
+    sns.histplot(data, kde=True)
+    plt.title(f'Histogram of {column}')
+
+    # Box Plot
+    plt.subplot(1, 2, 2)
+    sns.boxplot(x=data)
+    plt.title(f'Box Plot of {column}')
+
+    plt.tight_layout()
+
+
+def _draw_missing_matrix(data: pd.DataFrame, stage: str):
+    import matplotlib.pyplot as plt
+    import missingno as msno
+
+    plt.figure(figsize=(12, 6))
+    msno.matrix(data)
+    plt.xticks(rotation=45)
+    plt.title(f"Missing Data Matrix ({stage})", loc='center', fontsize=14, pad=20)
+    plt.xlabel("Features")
+    plt.ylabel("Records")
+    plt.tight_layout()
+
+
+# =========== Figure specs ===========
+
+def categorical_figure_specs(df: pd.DataFrame, columns: list, save_dir: str = "outputs/eda") -> list:
+    """Bar chart specs for categorical columns (see rendering.render_figures)."""
+    return [FigureSpec(_draw_bar_chart, df[column],
+                       os.path.join(save_dir, f"{column.replace(' ', '_')}_bar_chart.png"),
+                       params={'column': column})
+            for column in columns]
+
+
+def numerical_figure_specs(df: pd.DataFrame, columns: list, save_dir: str = "outputs/eda") -> list:
+    """Histogram + box plot specs for numerical columns."""
+    return [FigureSpec(_draw_eda_plot, df[column],
+                       os.path.join(save_dir, f"{column.replace(' ', '_')}_eda_plot.png"),
+                       params={'column': column})
+            for column in columns]
+
+
+def missing_data_figure_spec(df: pd.DataFrame, stage: str, save_dir: str = "outputs/eda/imputed") -> FigureSpec:
+    """Missing-data matrix spec for one stage ('before', 'after_knn', ...)."""
+    df_plot = df.drop(columns=[col for col in MISSING_PLOT_EXCLUDE if col in df.columns])
+    return FigureSpec(_draw_missing_matrix, df_plot,
+                      os.path.join(save_dir, f"missing_matrix_{stage}.png"),
+                      params={'stage': stage})
+
+
+@instrument
+def print_frequency_tables(df: pd.DataFrame, columns: list):
+    for column in columns:
+        print(f"\nFrequency Table for '{column}':")
+        print(df[column].value_counts())
+
+
+def _show(specs: list):
+    """Draw specs in this process and display them (interactive use)."""
+    import matplotlib.pyplot as plt
+    from .rendering import PYPLOT_LOCK
+
+    for spec in specs:
+        os.makedirs(os.path.dirname(spec.path), exist_ok=True)
+        with PYPLOT_LOCK:
+            spec.draw(spec.data, **spec.params)
+            plt.savefig(spec.path)
+            print(f"Saved plot: {spec.path}")
+            plt.show()
+
+
+# =========== Public EDA functions ===========
+
+@instrument
+def analyze_categorical_columns(df: pd.DataFrame, columns: list, show_plots: bool = True,
+                                save_dir: str = "outputs/eda", n_jobs: int = None):
     """
     Print frequency tables and plot bar charts for each categorical column.
     Saves plots to specified directory.
@@ -16,32 +118,19 @@ def analyze_categorical_columns(df: pd.DataFrame, columns: list, show_plots: boo
     - columns (list): List of categorical column names
     - show_plots (bool): If True, displays plots
     - save_dir (str): Directory path where plots will be saved
+    - n_jobs (int): Rendering processes when show_plots is False
     """
-    os.makedirs(save_dir, exist_ok=True)  # Create directory if it doesn't exist
+    print_frequency_tables(df, columns)
+    specs = categorical_figure_specs(df, columns, save_dir)
+    if show_plots:
+        _show(specs)
+    else:
+        render_figures(specs, n_jobs=n_jobs)
 
-    for column in columns:
-        print(f"\nFrequency Table for '{column}':")
-        print(df[column].value_counts())
-
-        plt.figure(figsize=(12, 6))
-        sns.countplot(x=df[column])
-        plt.title(f'Bar Chart of {column}')
-        plt.xlabel(column)
-        plt.ylabel('Count')
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-
-        filename = os.path.join(save_dir, f"{column.replace(' ', '_')}_bar_chart.png")
-        plt.savefig(filename)
-        print(f"Saved chart: {filename}")
 
-        if show_plots:
-            plt.show()
-        else:
-            plt.close()
-
-
-def analyze_numerical_columns(df: pd.DataFrame, columns: list, show_plots: bool = True, save_dir: str = "outputs/eda"):
+@instrument
+def analyze_numerical_columns(df: pd.DataFrame, columns: list, show_plots: bool = True,
+                              save_dir: str = "outputs/eda", n_jobs: int = None):
     """
     Generate histograms and boxplots for a list of numerical columns.
 
@@ -50,32 +139,15 @@ def analyze_numerical_columns(df: pd.DataFrame, columns: list, show_plots: bool
     - columns (list): List of numerical column names to plot.
     - show_plots (bool): Whether to display plots.
     - save_dir (str): Directory path where plots will be saved.
+    - n_jobs (int): Rendering processes when show_plots is False.
     """
-    os.makedirs(save_dir, exist_ok=True)
-
-    for column in columns:
-        plt.figure(figsize=(12, 5))
-
-        # Histogram
-        plt.subplot(1, 2, 1)
-        sns.histplot(df[column], kde=True)
-        plt.title(f'Histogram of {column}')
-
-        # Box Plot
-        plt.subplot(1, 2, 2)
-        sns.boxplot(x=df[column])
-        plt.title(f'Box Plot of {column}')
-
-        plt.tight_layout()
-        filename = os.path.join(save_dir, f"{column.replace(' ', '_')}_eda_plot.png")
-        plt.savefig(filename)
-        print(f"Saved EDA plot: {filename}")
-
-        if show_plots:
-            plt.show()
-        else:
-            plt.close()
+    specs = numerical_figure_specs(df, columns, save_dir)
+    if show_plots:
+        _show(specs)
+    else:
+        render_figures(specs, n_jobs=n_jobs)
 
+@instrument
 def visualize_missing_data(df: pd.DataFrame, stage: str, save_dir: str = "outputs/eda/imputed"):
     """
     Visualize missing data using missingno before and after imputation.
@@ -85,23 +157,5 @@ def visualize_missing_data(df: pd.DataFrame, stage: str, save_dir: str = "output
     - stage (str): Label for the current stage (e.g., 'before', 'after_knn', 'after_mice')
     - save_dir (str): Directory path to save the plots
     """
-    
-    # Drop unwanted columns from visualization
-    columns_to_exclude = ['Diagnostic Group', 'Diagnostic Group Code']
-    df_plot = df.drop(columns=[col for col in columns_to_exclude if col in df.columns])
-
-    os.makedirs(save_dir, exist_ok=True)
-
-    plt.figure(figsize=(12, 6))
-    ax = msno.matrix(df_plot)
-    plt.xticks(rotation=45)
-    plt.title(f"Missing Data Matrix ({stage})", loc='center', fontsize=14, pad=20)
-    plt.xlabel("Features")
-    plt.ylabel("Records")
-    plt.tight_layout()
-    plt.savefig(os.path.join(save_dir, f"missing_matrix_{stage}.png"))
-    plt.close()
-
+    render_figures([missing_data_figure_spec(df, stage, save_dir)], n_jobs=1)
     print(f"Saved missing data plot for {stage}.")
-
-
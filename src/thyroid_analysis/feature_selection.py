@@ -1,25 +1,115 @@
 # src/thyroid_analysis/feature_selection.py
 
+import hashlib
+import json
+import os
 from collections import Counter
-from sklearn.feature_selection import RFE
-from sklearn.linear_model import LogisticRegression
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.decomposition import PCA
+from concurrent.futures import ThreadPoolExecutor
 
-def select_features_consensus(X, y, numerical_columns, n_feat=8, n_pc=5):
+import numpy as np
+import pandas as pd
+
+from .utils import attach_shared_array, process_pool, share_array
+from .instrumentation import instrument
+
+
+# =========== Selector rankings ===========
+# Each ranker returns a feature order (best first). RFE only eliminates down to the
+# n_feat asked for; its ranking also serves any larger n_feat (see _cached_ranking).
+
+def _rank_rfe(X, y, n_feat=1, step=1, max_iter=1000):
+    """
+    RFE elimination order down to n_feat survivors (in column order, then the eliminated
+    features, last eliminated first): the top n_feat equal RFE(n_features_to_select=n_feat).support_.
+    """
+    from sklearn.feature_selection import RFE
+    from sklearn.linear_model import LogisticRegression
+
+    rfe = RFE(LogisticRegression(max_iter=max_iter), n_features_to_select=min(n_feat, X.shape[1]), step=step)
+    rfe.fit(X, y)
+    return np.argsort(rfe.ranking_, kind='stable')
+
+
+def _rank_decision_tree(X, y, random_state=42):
+    from sklearn.tree import DecisionTreeClassifier
+
+    dt = DecisionTreeClassifier(random_state=random_state)
+    dt.fit(X, y)
+    return np.argsort(-dt.feature_importances_, kind='stable')
+
+
+def _rank_pca(X, y, n_pc=5):
+    from sklearn.decomposition import PCA
+
+    pca = PCA(n_components=n_pc)
+    pca.fit(X)
+    return np.argsort(-np.abs(pca.components_[0]), kind='stable')
+
+
+# name -> (output key, ranking function, default params, list in ranking order?)
+# Elimination-style selectors report their selected set in column order, like RFE.support_.
+SELECTORS = {
+    'rfe': ('RFE', _rank_rfe, {}, False),
+    'decision_tree': ('DecisionTree', _rank_decision_tree, {}, True),
+    'pca': ('PCA', _rank_pca, {}, True),
+}
+
+# (data hash, selector, params without n_feat) -> (elimination depth, ranking)
+_RANKING_CACHE = {}
+
+
+def data_fingerprint(X: pd.DataFrame, y) -> str:
+    """Content hash of the feature matrix (including column names) and the labels."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in X.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def clear_selection_cache():
+    _RANKING_CACHE.clear()
+
+
+def _cached_ranking(name, X, y, fingerprint, params):
+    # An elimination stopped at n_feat agrees with a deeper one on its top n_feat, so
+    # it is keyed without n_feat and reused whenever it went at least as deep
+    depth = params.get('n_feat', 1)  # Rankers without n_feat rank every feature
+    other = {k: v for k, v in params.items() if k != 'n_feat'}
+    key = (fingerprint, name, json.dumps(other, sort_keys=True))
+    cached = _RANKING_CACHE.get(key)
+    if cached is None or cached[0] > depth:
+        _, rank, defaults, _ = SELECTORS[name]
+        _RANKING_CACHE[key] = (depth, rank(X, y, **{**defaults, **params}))
+    return _RANKING_CACHE[key][1]
+
+
+@instrument
+def select_features_consensus(X, y, numerical_columns, n_feat=8, n_pc=5,
+                              selectors=('rfe', 'decision_tree', 'pca'), min_votes=2,
+                              selector_params=None, n_jobs=None):
     """
     Implements RO_2 FEO as shown in the diagram:
     - Uses RFE, PCA, and DT to select important features.
     - Aggregates them into Local/Global CFS.
     - Produces Ensemble Biomarkers via majority voting.
-    
+
+    The selectors run concurrently and their feature rankings are memoised on a
+    hash of (X, y, selector params), so re-running with another vote threshold,
+    selector subset or a larger n_feat reuses earlier fits (RFE only eliminates down
+    to n_feat, so a smaller n_feat refits it).
+
     Parameters:
     - X (pd.DataFrame): Feature matrix
     - y (pd.Series): Target labels
     - numerical_columns (list): List of numerical features
     - n_feat (int): Top features from each technique
     - n_pc (int): Number of principal components (for PCA)
-    
+    - selectors (tuple): Names from SELECTORS ('rfe', 'decision_tree', 'pca')
+    - min_votes (int): Votes a feature needs to enter the consensus
+    - selector_params (dict): {selector name: extra keyword arguments}
+    - n_jobs (int): Threads used to run the selectors (default: one per selector)
+
     Returns:
     - dict: {
         'RFE': [...],
@@ -28,32 +118,167 @@ def select_features_consensus(X, y, numerical_columns, n_feat=8, n_pc=5):
         'Consensus': [...],  # Final biomarkers
     }
     """
+    unknown = [name for name in selectors if name not in SELECTORS]
+    if unknown:
+        raise ValueError(f"Unknown selectors: {unknown}. Available: {list(SELECTORS)}")
 
-    # === Step 1: RFE ===
-    rfe = RFE(LogisticRegression(max_iter=1000), n_features_to_select=n_feat)
-    rfe.fit(X[numerical_columns], y)
-    F_rfe = [feat for feat, sel in zip(numerical_columns, rfe.support_) if sel]
+    features = X[numerical_columns]
+    fingerprint = data_fingerprint(features, y)
+    params = {name: dict((selector_params or {}).get(name, {})) for name in selectors}
+    if 'pca' in params:
+        params['pca'].setdefault('n_pc', n_pc)
+    if 'rfe' in params:
+        params['rfe'].setdefault('n_feat', n_feat)
 
-    # === Step 2: Decision Tree Importance ===
-    dt = DecisionTreeClassifier(random_state=42)
-    dt.fit(X[numerical_columns], y)
-    importances = dt.feature_importances_
-    F_dt = [f for f, _ in sorted(zip(numerical_columns, importances), key=lambda x: x[1], reverse=True)[:n_feat]]
+    with ThreadPoolExecutor(max_workers=n_jobs or len(selectors)) as pool:
+        futures = {name: pool.submit(_cached_ranking, name, features, y, fingerprint, params[name])
+                   for name in selectors}
+        rankings = {name: future.result() for name, future in futures.items()}
 
-    # === Step 3: PCA Top Loadings ===
-    pca = PCA(n_components=n_pc)
-    pca.fit(X[numerical_columns])
-    loadings = abs(pca.components_[0])
-    F_pca = [f for f, _ in sorted(zip(numerical_columns, loadings), key=lambda x: x[1], reverse=True)[:n_feat]]
+    results = {}
+    for name in selectors:
+        key, _, _, ranked = SELECTORS[name]
+        top = rankings[name][:n_feat]
+        results[key] = [numerical_columns[i] for i in (top if ranked else sorted(top))]
 
-    # === Step 4: Consensus Voting (>=2 votes)
-    all_feats = F_rfe + F_dt + F_pca
+    # === Consensus Voting (>= min_votes)
+    all_feats = [f for name in selectors for f in results[SELECTORS[name][0]]]
     counts = Counter(all_feats)
-    F_consensus = [f for f, c in counts.items() if c >= 2]
+    results["Consensus"] = [f for f, c in counts.items() if c >= min_votes]
+    return results
 
-    return {
-        "RFE": F_rfe,
-        "DecisionTree": F_dt,
-        "PCA": F_pca,
-        "Consensus": F_consensus
-    }
+
+# =========== Stability selection ===========
+
+def _draw_rows(rng, y, sample_fraction, bootstrap, stratify):
+    """Row indices of one resample; stratified draws take the same share of every class."""
+    if not stratify:
+        size = len(y) if bootstrap else int(round(sample_fraction * len(y)))
+        return rng.choice(len(y), size=size, replace=bootstrap)
+    rows = []
+    for label in np.unique(y):
+        members = np.flatnonzero(y == label)
+        size = len(members) if bootstrap else max(1, int(round(sample_fraction * len(members))))
+        rows.append(rng.choice(members, size=size, replace=bootstrap))
+    return np.concatenate(rows)
+
+
+def _stability_draws(x_spec, y_spec, selectors, selector_params, n_feat, min_votes,
+                     seeds, sample_fraction, bootstrap, stratify):
+    """
+    Worker: run the selectors on resampled rows for each seed and count selections.
+    Returns (counts, skipped): draws left with a single class cannot be ranked by the
+    supervised selectors and are skipped.
+    """
+    x_shm, X = attach_shared_array(x_spec)
+    y_shm, y = attach_shared_array(y_spec)
+    try:
+        n_features = X.shape[1]
+        counts = np.zeros((len(selectors) + 1, n_features), dtype=np.int64)
+        skipped = 0
+        for seed in seeds:
+            rng = np.random.default_rng(seed)
+            rows = _draw_rows(rng, y, sample_fraction, bootstrap, stratify)
+            if np.unique(y[rows]).size < 2:
+                skipped += 1
+                continue
+            votes = np.zeros(n_features, dtype=np.int64)
+            for s, name in enumerate(selectors):
+                _, rank, defaults, _ = SELECTORS[name]
+                top = rank(X[rows], y[rows], **{**defaults, **selector_params[name]})[:n_feat]
+                counts[s, top] += 1
+                votes[top] += 1
+            counts[-1] += votes >= min_votes
+        return counts, skipped
+    finally:
+        x_shm.close()
+        y_shm.close()
+
+
+@instrument
+def stability_selection(X, y, numerical_columns, n_draws=200, sample_fraction=0.5, bootstrap=False,
+                        n_feat=8, n_pc=5, selectors=('rfe', 'decision_tree', 'pca'), min_votes=2,
+                        selector_params=None, standardize=True, stratify=True, n_jobs=None, random_state=42):
+    """
+    Stability selection for the consensus biomarkers: rerun the selectors on many
+    subsamples (or bootstrap draws) and report how often each feature is selected,
+    instead of a single vote on the full data.
+
+    The feature matrix and labels are placed in shared memory once; worker processes
+    each take a slice of the draws.
+
+    Parameters:
+    - X (pd.DataFrame): Feature matrix
+    - y (pd.Series): Target labels
+    - numerical_columns (list): List of numerical features
+    - n_draws (int): Number of resamples
+    - sample_fraction (float): Share of rows per subsample (ignored when bootstrap=True)
+    - bootstrap (bool): Draw n rows with replacement instead of subsampling
+    - stratify (bool): Resample within each class, so every draw keeps the class
+      proportions and rare classes are never dropped. Unstratified draws that end up
+      with a single class are skipped and counted
+    - n_feat (int): Top features from each technique per draw
+    - n_pc (int): Number of principal components (for PCA)
+    - selectors (tuple): Names from SELECTORS
+    - min_votes (int): Votes a feature needs to count as consensus in a draw
+    - selector_params (dict): {selector name: extra keyword arguments}
+    - standardize (bool): Z-score the features first; RFE's logistic fits converge far
+      faster on scaled data, which is what makes hundreds of draws affordable
+    - n_jobs (int): Worker processes (default: CPU count)
+    - random_state (int): Seed for the draws
+
+    Returns:
+    - pd.DataFrame: Selection frequency (0-1) per feature for each selector and for the
+      consensus vote over the draws that were ranked, sorted by consensus frequency;
+      attrs['draws'] and attrs['skipped_draws'] hold the number of ranked and skipped draws
+    """
+    unknown = [name for name in selectors if name not in SELECTORS]
+    if unknown:
+        raise ValueError(f"Unknown selectors: {unknown}. Available: {list(SELECTORS)}")
+
+    features = X[numerical_columns].to_numpy(dtype=float)
+    if standardize:
+        std = features.std(axis=0)
+        features = (features - features.mean(axis=0)) / np.where(std > 0, std, 1.0)
+    labels = np.asarray(y)
+    if np.unique(labels).size < 2:
+        raise ValueError("Stability selection needs at least 2 classes in y")
+    params = {name: dict((selector_params or {}).get(name, {})) for name in selectors}
+    if 'pca' in params:
+        params['pca'].setdefault('n_pc', n_pc)
+    if 'rfe' in params:
+        params['rfe'].setdefault('n_feat', n_feat)
+
+    seeds = np.random.SeedSequence(random_state).spawn(n_draws)
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, n_draws))
+    batches = [seeds[i::n_jobs] for i in range(n_jobs)]
+
+    x_shm, x_spec = share_array(features)
+    y_shm, y_spec = share_array(labels)
+    try:
+        args = (x_spec, y_spec, list(selectors), params, n_feat, min_votes)
+        if n_jobs == 1:
+            results = [_stability_draws(*args, batches[0], sample_fraction, bootstrap, stratify)]
+        else:
+            with process_pool(n_jobs) as pool:
+                futures = [pool.submit(_stability_draws, *args, batch, sample_fraction, bootstrap, stratify)
+                           for batch in batches]
+                results = [future.result() for future in futures]
+    finally:
+        for shm in (x_shm, y_shm):
+            shm.close()
+            shm.unlink()
+
+    counts = sum(result[0] for result in results)
+    skipped = sum(result[1] for result in results)
+    used = n_draws - skipped
+    if skipped:
+        print(f"⚠️ Skipped {skipped} of {n_draws} draws with a single class")
+    if not used:
+        raise ValueError("Every draw had a single class; use stratify=True or a larger sample_fraction")
+
+    keys = [SELECTORS[name][0] for name in selectors] + ['Consensus']
+    frequencies = pd.DataFrame(counts.T / used, index=pd.Index(numerical_columns, name='Feature'), columns=keys)
+    frequencies = frequencies.sort_values('Consensus', ascending=False)
+    frequencies.attrs.update({'draws': used, 'skipped_draws': skipped})
+    return frequencies
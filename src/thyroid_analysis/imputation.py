@@ -0,0 +1,293 @@
+# src/thyroid_analysis/imputation.py
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .utils import attach_shared_array, process_pool, share_array
+from .instrumentation import instrument
+
+# Label columns that must never be used as imputation features
+DEFAULT_EXCLUDE = ['Diagnostic Group Code']
+
+
+def _impute_knn_array(X: np.ndarray, n_neighbors: int = 5) -> np.ndarray:
+    from sklearn.impute import KNNImputer
+    return KNNImputer(n_neighbors=n_neighbors).fit_transform(X)
+
+
+def _impute_mice_array(X: np.ndarray, **params) -> np.ndarray:
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
+    return IterativeImputer(**params).fit_transform(X)
+
+
+def _impute_median_array(X: np.ndarray) -> np.ndarray:
+    """Column medians: the speed/accuracy floor the other imputers are judged against."""
+    from sklearn.impute import SimpleImputer
+    return SimpleImputer(strategy='median').fit_transform(X)
+
+
+# =========== Scalable KNN ===========
+
+def _merge_top_k(best_dist, best_vals, dist, vals, k):
+    """Merge candidate (dist, vals) into the running k smallest distances per row."""
+    all_dist = np.concatenate([best_dist, dist], axis=1)
+    all_vals = np.concatenate([best_vals, np.broadcast_to(vals, dist.shape)], axis=1)
+    if all_dist.shape[1] > k:
+        idx = np.argpartition(all_dist, k - 1, axis=1)[:, :k]
+        rows = np.arange(all_dist.shape[0])[:, None]
+        all_dist, all_vals = all_dist[rows, idx], all_vals[rows, idx]
+    return all_dist, all_vals
+
+
+def _knn_exact_blockwise(X, cells, n_neighbors, block_rows, block_donors, out):
+    """
+    Fill out[cells] with the same estimate as sklearn's KNNImputer (uniform weights,
+    nan-euclidean distance), but compare receivers and donors block by block and keep
+    only a running top-k per missing cell, so memory is bounded by
+    block_rows x block_donors instead of n_receivers x n_rows.
+    """
+    from sklearn.metrics.pairwise import nan_euclidean_distances
+
+    mask = np.isnan(X)
+    col_means = np.nanmean(X, axis=0)
+    receivers = np.flatnonzero(cells.any(axis=1))
+    for r0 in range(0, len(receivers), block_rows):
+        rows = receivers[r0:r0 + block_rows]
+        R, R_cells = X[rows], cells[rows]
+        cols = np.flatnonzero(R_cells.any(axis=0))
+        best = {j: (np.full((R_cells[:, j].sum(), 0), np.inf), np.empty((R_cells[:, j].sum(), 0)))
+                for j in cols}
+        for d0 in range(0, X.shape[0], block_donors):
+            D, D_mask = X[d0:d0 + block_donors], mask[d0:d0 + block_donors]
+            dist = nan_euclidean_distances(R, D)
+            dist[np.isnan(dist)] = np.inf  # no shared coordinates: never a donor
+            for j in cols:
+                donors = ~D_mask[:, j]
+                if donors.any():
+                    best[j] = _merge_top_k(*best[j], dist[R_cells[:, j]][:, donors],
+                                           D[donors, j][None, :], n_neighbors)
+        for j in cols:
+            best_dist, best_vals = best[j]
+            weights = np.isfinite(best_dist)
+            total = weights.sum(axis=1)
+            values = np.where(weights, best_vals, 0.0).sum(axis=1)
+            out[rows[R_cells[:, j]], j] = np.where(total > 0, values / np.maximum(total, 1), col_means[j])
+
+
+def _knn_indexed(X, n_neighbors, algorithm, out):
+    """
+    Approximate KNN using a tree index per (observed columns, target column) pair.
+
+    For a receiver with observed columns O, donors for column j are restricted to rows
+    fully observed on O and j, where nan-euclidean distance reduces to plain euclidean
+    distance on O and a ball/kd tree applies. Returns the mask of cells that found no
+    such donors; the caller fills those exactly.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    mask = np.isnan(X)
+    unserved = np.zeros_like(mask)
+    patterns, inverse = np.unique(mask, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    for p, pattern in enumerate(patterns):
+        if not pattern.any():
+            continue
+        rows = np.flatnonzero(inverse == p)
+        observed = np.flatnonzero(~pattern)
+        if observed.size == 0:
+            unserved[np.ix_(rows, np.flatnonzero(pattern))] = True
+            continue
+        for j in np.flatnonzero(pattern):
+            donors = np.flatnonzero(~mask[:, observed].any(axis=1) & ~mask[:, j])
+            if donors.size == 0:
+                unserved[rows, j] = True
+                continue
+            index = NearestNeighbors(n_neighbors=min(n_neighbors, donors.size), algorithm=algorithm)
+            index.fit(X[np.ix_(donors, observed)])
+            _, neighbours = index.kneighbors(X[np.ix_(rows, observed)])
+            out[rows, j] = X[donors[neighbours], j].mean(axis=1)
+    return unserved
+
+
+@instrument
+def impute_knn_scalable(X: np.ndarray, n_neighbors: int = 5, index: str = None,
+                        block_rows: int = 1024, block_donors: int = 16384) -> np.ndarray:
+    """
+    KNN imputation with bounded memory for large cohorts.
+
+    Parameters:
+    - X (np.ndarray): 2-D float array with NaN for missing values
+    - n_neighbors (int): Neighbours averaged per missing value
+    - index (str): None for exact blockwise search (matches KNNImputer up to distance ties),
+      or 'ball_tree' / 'kd_tree' for approximate tree-indexed search
+    - block_rows (int): Receiver rows per block
+    - block_donors (int): Donor rows per block; peak extra memory is about
+      block_rows * block_donors * 8 bytes
+
+    Returns:
+    - np.ndarray: Imputed copy of X
+    """
+    X = np.asarray(X, dtype=float)
+    X = X[:, ~np.isnan(X).all(axis=0)]  # KNNImputer drops all-missing columns as well
+    out = X.copy()
+    cells = np.isnan(X)
+    if index is not None:
+        cells = _knn_indexed(X, n_neighbors, index, out)
+    if cells.any():
+        _knn_exact_blockwise(X, cells, n_neighbors, block_rows, block_donors, out)
+    return out
+
+
+@instrument
+def knn_agreement(X: np.ndarray, imputed: np.ndarray, n_neighbors: int = 5,
+                  sample_size: int = 500, random_state: int = 0, columns: list = None) -> pd.DataFrame:
+    """
+    Compare an (approximate) KNN imputation with sklearn's exact KNNImputer on a sample of rows.
+
+    Parameters:
+    - X (np.ndarray): Original array with NaN
+    - imputed (np.ndarray): Output of impute_knn_scalable (or any imputer) for X
+    - n_neighbors (int): Neighbours used by the exact reference
+    - sample_size (int): Number of rows with missing values to check
+    - random_state (int): Seed for the row sample
+    - columns (list): Column names of X, used to label the report
+
+    Distance ties (common with coarse columns such as Age or Smoking) make even two
+    KNNImputer runs disagree on some cells, so read the match rate relative to that.
+
+    Returns:
+    - pd.DataFrame: Per column: imputed cells checked, MAE, MAE relative to the column std,
+      and the share of cells matching the exact value
+    """
+    from sklearn.impute import KNNImputer
+
+    X = np.asarray(X, dtype=float)
+    keep = ~np.isnan(X).all(axis=0)
+    X, imputed = X[:, keep], np.asarray(imputed, dtype=float)
+    names = [c for c, k in zip(columns, keep) if k] if columns is not None else list(range(X.shape[1]))
+    mask = np.isnan(X)
+    candidates = np.flatnonzero(mask.any(axis=1))
+    rng = np.random.default_rng(random_state)
+    rows = rng.choice(candidates, size=min(sample_size, candidates.size), replace=False)
+
+    exact = KNNImputer(n_neighbors=n_neighbors).fit(X).transform(X[rows])
+    sample_mask = mask[rows]
+    diff = np.abs(exact - imputed[rows])
+    report = []
+    for j in range(X.shape[1]):
+        d = diff[sample_mask[:, j], j]
+        std = np.nanstd(X[:, j])
+        report.append({
+            'column': names[j],
+            'cells': d.size,
+            'mae': d.mean() if d.size else 0.0,
+            'relative_mae': d.mean() / std if d.size and std > 0 else 0.0,
+            'exact_match_rate': np.isclose(d, 0.0).mean() if d.size else 1.0,
+        })
+    return pd.DataFrame(report)
+
+
+def _impute_knn_blockwise_array(X: np.ndarray, **params) -> np.ndarray:
+    return impute_knn_scalable(X, **params)
+
+
+def _impute_knn_ball_tree_array(X: np.ndarray, **params) -> np.ndarray:
+    return impute_knn_scalable(X, index='ball_tree', **params)
+
+
+# name -> function(X, **params) returning the imputed array; must be importable by workers
+IMPUTERS = {
+    'knn': _impute_knn_array,
+    'mice': _impute_mice_array,
+    'knn_blockwise': _impute_knn_blockwise_array,
+    'knn_ball_tree': _impute_knn_ball_tree_array,
+    'median': _impute_median_array,
+}
+
+
+def imputation_columns(df: pd.DataFrame, columns: list = None, exclude: list = DEFAULT_EXCLUDE) -> list:
+    """
+    Resolve the columns an imputer may read and fill: the allow-list if given,
+    otherwise every numeric column, minus the excluded label columns.
+    """
+    if columns is None:
+        columns = df.select_dtypes(include=[np.number]).columns
+    return [col for col in columns if col not in set(exclude or [])]
+
+
+def _run_imputer(name: str, spec, params: dict):
+    """Worker entry point: attach to the shared input, impute, and time it."""
+    shm, X = attach_shared_array(spec)
+    try:
+        start = time.perf_counter()
+        imputed = IMPUTERS[name](X, **params)
+        return imputed, time.perf_counter() - start
+    finally:
+        shm.close()
+
+
+@instrument
+def run_imputers(df: pd.DataFrame, imputers: list = ('knn', 'mice'), columns: list = None,
+                 exclude: list = DEFAULT_EXCLUDE, imputer_params: dict = None,
+                 n_jobs: int = None, verbose: bool = True):
+    """
+    Run several imputers on the same frame concurrently in a process pool.
+
+    The selected columns are copied once into shared memory and every worker reads
+    that block directly instead of receiving its own pickled copy of the frame.
+
+    Parameters:
+    - df (pd.DataFrame): Frame with missing values
+    - imputers (list): Names from IMPUTERS to run
+    - columns (list): Allow-list of columns to impute (default: all numeric columns)
+    - exclude (list): Columns never used for imputation, e.g. the target code
+    - imputer_params (dict): {imputer name: keyword arguments}
+    - n_jobs (int): Worker processes (default: one per imputer, capped at the CPU count);
+      1 runs everything in this process
+    - verbose (bool): Print per-imputer timings and remaining missing counts
+
+    Returns:
+    - tuple: ({name: imputed DataFrame}, {name: seconds})
+    """
+    unknown = [name for name in imputers if name not in IMPUTERS]
+    if unknown:
+        raise ValueError(f"Unknown imputers: {unknown}. Available: {list(IMPUTERS)}")
+
+    columns = imputation_columns(df, columns, exclude)
+    # Same memory layout inline and in workers: KNN tie-breaking depends on it
+    X = np.ascontiguousarray(df[columns].to_numpy(dtype=float))
+    imputer_params = imputer_params or {}
+    if n_jobs is None:
+        n_jobs = min(len(imputers), os.cpu_count() or 1)
+
+    arrays, timings = {}, {}
+    if n_jobs <= 1 or len(imputers) <= 1:
+        for name in imputers:
+            start = time.perf_counter()
+            arrays[name] = IMPUTERS[name](X, **imputer_params.get(name, {}))
+            timings[name] = time.perf_counter() - start
+    else:
+        shm, spec = share_array(X)
+        try:
+            with process_pool(n_jobs) as pool:
+                futures = {name: pool.submit(_run_imputer, name, spec, imputer_params.get(name, {}))
+                           for name in imputers}
+                for name, future in futures.items():
+                    arrays[name], timings[name] = future.result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    results = {}
+    for name, imputed in arrays.items():
+        df_imputed = df.copy()
+        df_imputed[columns] = imputed
+        results[name] = df_imputed
+        if verbose:
+            remaining = int(df_imputed[columns].isnull().sum().sum())
+            print(f"{name.upper()} imputation: {timings[name]:.2f}s, {remaining} missing values left in {len(columns)} columns")
+    return results, timings
@@ -0,0 +1,270 @@
+# src/thyroid_analysis/imputation_eval.py
+#
+# Imputation accuracy with a known ground truth: hide observed values under an MCAR or
+# MAR pattern, impute, and score the imputers on the hidden cells. Every (imputer,
+# pattern, rate, repetition) run is a separate task, run in a process pool on a shared
+# copy of the data and cached on disk, so adding an imputer or repetitions only runs
+# the new tasks.
+#
+#     python -m thyroid_analysis.imputation_eval --imputers knn mice median --repetitions 10
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from .imputation import DEFAULT_EXCLUDE, IMPUTERS, imputation_columns
+from .instrumentation import instrument
+from .utils import attach_shared_array, process_pool, share_array
+
+DEFAULT_CACHE_DIR = "outputs/cache/imputation_eval"
+PATTERNS = ('mcar', 'mar')
+# Bump when masking or scoring changes so cached runs are not reused
+EVAL_VERSION = 1
+
+
+def mask_values(X: np.ndarray, rate: float, pattern: str = 'mcar', driver: int = None,
+                strength: float = 2.0, rng=None) -> np.ndarray:
+    """
+    Choose observed cells to hide.
+
+    Parameters:
+    - X (np.ndarray): Data with NaN for missing values
+    - rate (float): Expected share of each column's observed cells to hide
+    - pattern (str): 'mcar' (every observed cell equally likely) or 'mar' (the chance
+      rises with the driver column's value, through a logistic curve)
+    - driver (int): MAR only: index of the column the missingness depends on; it is
+      never masked itself (default: the first column without missing values)
+    - strength (float): MAR only: slope of the logistic curve on the standardised driver
+    - rng (np.random.Generator): Random source
+
+    Returns:
+    - np.ndarray: Boolean mask, True for the cells to hide. Each column keeps at least
+      one observed value so column-wise imputers still see it.
+    """
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern '{pattern}'. Available: {list(PATTERNS)}")
+    if not 0 < rate < 1:
+        raise ValueError(f"rate must be between 0 and 1, got {rate}")
+    rng = rng if rng is not None else np.random.default_rng()
+    observed = ~np.isnan(X)
+
+    if pattern == 'mcar':
+        probability = np.full(X.shape, rate)
+    else:
+        if driver is None:
+            complete = np.flatnonzero(observed.all(axis=0))
+            if not complete.size:
+                raise ValueError("MAR masking needs a driver column without missing values")
+            driver = int(complete[0])
+        values = X[:, driver]
+        z = (values - np.nanmean(values)) / (np.nanstd(values) or 1.0)
+        weight = 1 / (1 + np.exp(-strength * np.nan_to_num(z)))
+        probability = np.broadcast_to(np.clip(rate * weight / weight.mean(), 0, 1)[:, None], X.shape).copy()
+        probability[:, driver] = 0
+
+    mask = observed & (rng.random(X.shape) < probability)
+    for col in np.flatnonzero(observed.any(axis=0) & ~(observed & ~mask).any(axis=0)):
+        mask[rng.choice(np.flatnonzero(observed[:, col])), col] = False
+    return mask
+
+
+def _score(X: np.ndarray, imputed: np.ndarray, mask: np.ndarray, scale: np.ndarray) -> list:
+    """Per-column error on the hidden cells."""
+    records = []
+    for col in range(X.shape[1]):
+        hidden = mask[:, col]
+        if not hidden.any():
+            records.append({'n_masked': 0, 'rmse': np.nan, 'mae': np.nan, 'nrmse': np.nan})
+            continue
+        error = imputed[hidden, col] - X[hidden, col]
+        rmse = float(np.sqrt(np.mean(error ** 2)))
+        records.append({'n_masked': int(hidden.sum()), 'rmse': rmse, 'mae': float(np.mean(np.abs(error))),
+                        'nrmse': rmse / scale[col] if scale[col] else np.nan})
+    return records
+
+
+def _warm_imports():
+    # The imputers import sklearn lazily; do it before the clock starts so the first
+    # run in each worker is not charged for it
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    import sklearn.impute  # noqa: F401
+    import sklearn.neighbors  # noqa: F401
+
+
+def _run_task(spec, task: dict) -> dict:
+    """Worker entry point: mask the shared data, impute, score."""
+    _warm_imports()
+    shm, X = attach_shared_array(spec)
+    try:
+        rng = np.random.default_rng([task['seed'], PATTERNS.index(task['pattern']), round(task['rate'] * 1e6)])
+        mask = mask_values(X, task['rate'], task['pattern'], task['driver'], rng=rng)
+        X_masked = np.where(mask, np.nan, X)
+        start = time.perf_counter()
+        imputed = IMPUTERS[task['imputer']](X_masked, **task['params'])
+        seconds = time.perf_counter() - start
+        if imputed.shape != X.shape:
+            raise ValueError(f"{task['imputer']} returned shape {imputed.shape}, expected {X.shape}")
+        return {'seconds': seconds, 'features': _score(X, imputed, mask, np.nanstd(X, axis=0))}
+    finally:
+        shm.close()
+
+
+def _task_key(fingerprint: str, task: dict) -> str:
+    payload = json.dumps([EVAL_VERSION, fingerprint, task], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+@instrument
+def evaluate_imputers(df: pd.DataFrame, imputers: list = ('knn', 'mice', 'median'), patterns: list = PATTERNS,
+                      rates: list = (0.1,), repetitions: int = 5, seed: int = 0, columns: list = None,
+                      exclude: list = DEFAULT_EXCLUDE, driver: str = None, imputer_params: dict = None,
+                      n_jobs: int = None, cache_dir: str = DEFAULT_CACHE_DIR, use_cache: bool = True,
+                      verbose: bool = True) -> pd.DataFrame:
+    """
+    Score imputers on values hidden from them.
+
+    Parameters:
+    - df (pd.DataFrame): Cleaned frame (its missing values stay missing; only observed
+      cells are hidden and scored)
+    - imputers (list): Names from imputation.IMPUTERS
+    - patterns (list): 'mcar' and/or 'mar'
+    - rates (list): Shares of observed cells to hide
+    - repetitions (int): Masks per (pattern, rate); repetition r uses seed + r, and every
+      imputer sees the same masks, so their errors can be compared pairwise
+    - seed (int): Base seed
+    - columns (list), exclude (list): Columns given to the imputers (as run_imputers)
+    - driver (str): MAR driver column (default: the first column without missing values,
+      'Age' on the thyroid cohort)
+    - imputer_params (dict): {imputer name: keyword arguments}
+    - n_jobs (int): Worker processes (default: CPU count); 1 runs in this process
+    - cache_dir (str): One JSON file per finished task
+    - use_cache (bool): Reuse and store task results
+    - verbose (bool): Print progress and cache hits
+
+    Returns:
+    - pd.DataFrame: One row per imputer, pattern, rate, repetition and feature with
+      n_masked, rmse, mae, nrmse (rmse / the feature's standard deviation) and seconds
+      (imputation time of the whole run)
+    """
+    unknown = [name for name in imputers if name not in IMPUTERS]
+    if unknown:
+        raise ValueError(f"Unknown imputers: {unknown}. Available: {list(IMPUTERS)}")
+    columns = imputation_columns(df, columns, exclude)
+    if driver is not None and driver not in columns:
+        raise ValueError(f"MAR driver '{driver}' is not one of the imputed columns {columns}")
+    X = np.ascontiguousarray(df[columns].to_numpy(dtype=float))
+    imputer_params = imputer_params or {}
+
+    digest = hashlib.sha256(json.dumps(columns).encode())
+    digest.update(X.tobytes())
+    fingerprint = digest.hexdigest()
+
+    tasks = [{'imputer': name, 'params': imputer_params.get(name, {}), 'pattern': pattern, 'rate': rate,
+              'repetition': rep, 'seed': seed + rep, 'driver': columns.index(driver) if driver else None}
+             for pattern in patterns for rate in rates for rep in range(repetitions) for name in imputers]
+    results, todo = {}, []
+    for i, task in enumerate(tasks):
+        path = os.path.join(cache_dir, f"{_task_key(fingerprint, task)}.json")
+        if use_cache and os.path.exists(path):
+            with open(path) as f:
+                results[i] = json.load(f)
+        else:
+            todo.append((i, task, path))
+    if verbose:
+        print(f"🧪 {len(tasks)} evaluation runs: {len(tasks) - len(todo)} cached, {len(todo)} to run")
+
+    def store(i, path, result):
+        results[i] = result
+        if use_cache:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(result, f)
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(todo), 1))
+    shm, spec = share_array(X)
+    try:
+        if n_jobs <= 1:
+            for i, task, path in todo:
+                store(i, path, _run_task(spec, task))
+        else:
+            with process_pool(n_jobs) as pool:
+                futures = [(i, path, pool.submit(_run_task, spec, task)) for i, task, path in todo]
+                for i, path, future in futures:
+                    store(i, path, future.result())
+    finally:
+        shm.close()
+        shm.unlink()
+
+    records = []
+    for i, task in enumerate(tasks):
+        for feature, scores in zip(columns, results[i]['features']):
+            records.append({'imputer': task['imputer'], 'pattern': task['pattern'], 'rate': task['rate'],
+                            'repetition': task['repetition'], 'feature': feature, **scores,
+                            'seconds': results[i]['seconds']})
+    return pd.DataFrame(records)
+
+
+def summarize_evaluation(results: pd.DataFrame, by_feature: bool = False) -> pd.DataFrame:
+    """
+    Average an evaluate_imputers table over repetitions.
+
+    Parameters:
+    - results (pd.DataFrame): Output of evaluate_imputers
+    - by_feature (bool): One row per feature instead of averaging nrmse over features
+
+    Returns:
+    - pd.DataFrame: Mean (and std across repetitions) of the errors plus the mean run
+      time, sorted by error
+    """
+    keys = ['imputer', 'pattern', 'rate']
+    if by_feature:
+        summary = results.groupby(keys + ['feature']).agg(
+            rmse=('rmse', 'mean'), rmse_std=('rmse', 'std'), mae=('mae', 'mean'), nrmse=('nrmse', 'mean'),
+            seconds=('seconds', 'mean'))
+        return summary.sort_values(keys[1:] + ['feature', 'nrmse'])
+    # Average over features per run first, so the spread is across repetitions
+    per_run = results.groupby(keys + ['repetition']).agg(nrmse=('nrmse', 'mean'), seconds=('seconds', 'first'))
+    summary = per_run.groupby(keys).agg(nrmse=('nrmse', 'mean'), nrmse_std=('nrmse', 'std'),
+                                        seconds=('seconds', 'mean'))
+    return summary.sort_values(keys[1:] + ['nrmse'])
+
+
+def main(argv: list = None):
+    import argparse
+
+    from .data_loader import load_excel_dataset
+    from .pipeline import file_path
+    from .preprocessing import PreprocessingPlan
+
+    parser = argparse.ArgumentParser(description="Score imputers on artificially hidden values")
+    parser.add_argument("--path", default=file_path)
+    parser.add_argument("--imputers", nargs="+", default=['knn', 'mice', 'median'], choices=list(IMPUTERS))
+    parser.add_argument("--patterns", nargs="+", default=list(PATTERNS), choices=list(PATTERNS))
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--by-feature", action="store_true", help="Report every feature separately")
+    parser.add_argument("--output", default=None, help="Also write the per-run table to this CSV")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    from . import config
+    config.suppress_warnings()
+    df = PreprocessingPlan(verbose=0).fit_transform(load_excel_dataset(args.path))
+    results = evaluate_imputers(df, args.imputers, args.patterns, args.rates, args.repetitions, args.seed,
+                                n_jobs=args.n_jobs, use_cache=not args.no_cache)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        results.to_csv(args.output, index=False)
+        print(f"💾 Saved evaluation runs to: {args.output}")
+    with pd.option_context('display.width', 200, 'display.max_rows', 500):
+        print(summarize_evaluation(results, by_feature=args.by_feature))
+
+
+if __name__ == "__main__":
+    main()
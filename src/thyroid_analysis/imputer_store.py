@@ -0,0 +1,212 @@
+# src/thyroid_analysis/imputer_store.py
+
+import datetime
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .imputation import DEFAULT_EXCLUDE, imputation_columns
+from .instrumentation import instrument
+
+DEFAULT_STORE_DIR = "outputs/models/imputers"
+
+
+def _make_imputer(method: str, params: dict):
+    if method == 'knn':
+        from sklearn.impute import KNNImputer
+        return KNNImputer(**params)
+    if method == 'mice':
+        from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+        from sklearn.impute import IterativeImputer
+        return IterativeImputer(**params)
+    raise ValueError(f"Unknown imputation method '{method}'. Available: ['knn', 'mice']")
+
+
+class ImputerModel:
+    """
+    A fitted KNN or iterative (MICE) imputer plus what is needed to reuse it safely:
+    the columns it was fitted on, the preprocessing schema fingerprint, and
+    per-column reference statistics for drift checks on later batches.
+
+    Note that a fitted KNN imputer keeps its training rows as the donor pool, so the
+    saved file grows with the cohort it was fitted on.
+    """
+
+    def __init__(self, method: str = 'knn', columns: list = None, schema: str = None, **params):
+        self.method = method
+        self.columns = columns
+        self.schema = schema
+        self.params = params
+        self.version = None
+
+    @instrument
+    def fit(self, df: pd.DataFrame, exclude: list = DEFAULT_EXCLUDE) -> "ImputerModel":
+        self.columns = imputation_columns(df, self.columns, exclude)
+        X = df[self.columns].to_numpy(dtype=float)
+        self.imputer_ = _make_imputer(self.method, self.params).fit(X)
+        self.reference_ = _column_stats(X)
+        self.n_rows_ = len(df)
+        self.fitted_at_ = datetime.datetime.now().isoformat(timespec='seconds')
+        return self
+
+    @instrument
+    def transform(self, df: pd.DataFrame, per_row: bool = False) -> pd.DataFrame:
+        """
+        Impute a new batch with the stored state; nothing is refitted.
+
+        per_row=True imputes each incomplete row on its own, so a row's values never
+        depend on the other rows of the batch. KNN computes donor distances in blocks
+        whose floating-point rounding depends on the batch, which can change the donors
+        chosen among (near-)equidistant ones; serving needs the same answer for a record
+        whether it is scored alone or in a micro-batch.
+        """
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Batch is missing imputer columns: {missing}")
+        X = df[self.columns].to_numpy(dtype=float)
+        if per_row:
+            X = X.copy()
+            for i in np.flatnonzero(np.isnan(X).any(axis=1)):
+                X[i] = self.imputer_.transform(X[i:i + 1])[0]
+        else:
+            X = self.imputer_.transform(X)
+        df_copy = df.copy()
+        df_copy[self.columns] = X
+        return df_copy
+
+    @instrument
+    def drift(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-column drift of a batch against the fitting data: the absolute mean shift in
+        units of the reference standard deviation, and the change in missing rate.
+        The batch score is the largest of these values.
+        """
+        current = _column_stats(df[self.columns].to_numpy(dtype=float))
+        ref = self.reference_
+        std = np.where(ref['std'] > 0, ref['std'], 1.0)
+        mean_shift = np.abs(np.nan_to_num(current['mean'] - ref['mean'])) / std
+        missing_shift = np.abs(current['missing_rate'] - ref['missing_rate'])
+        return pd.DataFrame({
+            'Feature': self.columns,
+            'mean_shift': mean_shift,
+            'missing_rate_shift': missing_shift,
+            'score': np.maximum(mean_shift, missing_shift),
+        })
+
+
+def _column_stats(X: np.ndarray) -> dict:
+    with np.errstate(all='ignore'):
+        return {
+            'mean': np.nanmean(X, axis=0),
+            'std': np.nanstd(X, axis=0),
+            'missing_rate': np.isnan(X).mean(axis=0),
+        }
+
+
+def _manifest_path(store_dir: str) -> str:
+    return os.path.join(store_dir, "manifest.json")
+
+
+def _read_manifest(store_dir: str) -> dict:
+    path = _manifest_path(store_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@instrument
+def save_imputer(model: ImputerModel, store_dir: str = DEFAULT_STORE_DIR) -> str:
+    """
+    Save a fitted imputer as the next version for its method and record it in manifest.json.
+
+    Returns:
+    - str: Path of the written artifact
+    """
+    import joblib
+
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = _read_manifest(store_dir)
+    entries = manifest.setdefault(model.method, [])
+    model.version = max((e['version'] for e in entries), default=0) + 1
+    path = os.path.join(store_dir, f"{model.method}_v{model.version}.joblib")
+    joblib.dump(model, path)
+    entries.append({
+        'version': model.version,
+        'file': os.path.basename(path),
+        'schema': model.schema,
+        'columns': model.columns,
+        'n_rows': model.n_rows_,
+        'fitted_at': model.fitted_at_,
+    })
+    with open(_manifest_path(store_dir), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"💾 Saved {model.method.upper()} imputer v{model.version} to: {path}")
+    return path
+
+
+@instrument
+def load_imputer(method: str = 'knn', store_dir: str = DEFAULT_STORE_DIR, version: int = None,
+                 schema: str = None) -> ImputerModel:
+    """
+    Load a saved imputer (latest version unless one is given). Returns None if none is saved.
+    Raises ValueError when schema is given and the artifact was fitted under another schema.
+    """
+    import joblib
+
+    entries = _read_manifest(store_dir).get(method, [])
+    if version is not None:
+        entries = [e for e in entries if e['version'] == version]
+    if not entries:
+        return None
+    entry = max(entries, key=lambda e: e['version'])
+    if schema is not None and entry['schema'] != schema:
+        raise ValueError(f"{method} imputer v{entry['version']} was fitted on schema {entry['schema']}, "
+                         f"current preprocessing schema is {schema}")
+    return joblib.load(os.path.join(store_dir, entry['file']))
+
+
+@instrument
+def impute_incremental(df_new: pd.DataFrame, method: str = 'knn', store_dir: str = DEFAULT_STORE_DIR,
+                       schema: str = None, drift_threshold: float = 0.25, history: pd.DataFrame = None,
+                       **params):
+    """
+    Impute a new batch with the stored imputer, refitting only when the batch has drifted.
+
+    Parameters:
+    - df_new (pd.DataFrame): Preprocessed batch to impute
+    - method (str): 'knn' or 'mice'
+    - store_dir (str): Directory with versioned artifacts and manifest.json
+    - schema (str): PreprocessingPlan.schema_fingerprint() of the batch's preprocessing
+    - drift_threshold (float): Refit when the largest per-column drift score exceeds this;
+      a schema change always refits, on the batch's columns rather than the stored ones
+    - history (pd.DataFrame): Earlier preprocessed data; a refit uses history + df_new
+    - params: Imputer keyword arguments used when (re)fitting
+
+    Returns:
+    - tuple: (imputed batch, report dict with version, refitted flag and drift score)
+    """
+    model = load_imputer(method, store_dir)
+    drift_score = None
+    schema_changed = model is not None and model.schema != schema
+    if schema_changed:
+        print(f"Preprocessing schema changed ({model.schema} -> {schema}); refitting {method} imputer")
+        refit = True
+    else:
+        if model is not None:
+            drift_score = float(model.drift(df_new)['score'].max())
+        refit = model is None or drift_score > drift_threshold
+
+    if refit:
+        training = df_new if history is None else pd.concat([history, df_new], ignore_index=True)
+        # The stored column list belongs to the old schema; take the batch's own columns
+        columns = imputation_columns(df_new) if model is None or schema_changed else model.columns
+        params = params or (model.params if model is not None else {})
+        model = ImputerModel(method, columns=columns, schema=schema, **params).fit(training)
+        save_imputer(model, store_dir)
+
+    report = {'method': method, 'version': model.version, 'refitted': refit, 'drift': drift_score}
+    print(f"{method.upper()} imputer v{model.version}: drift={drift_score}, refitted={refit}")
+    return model.transform(df_new), report
@@ -0,0 +1,275 @@
+# src/thyroid_analysis/ingestion.py
+#
+# Multi-file, multi-site cohort ingestion. Sources (Excel, CSV or Parquet extracts,
+# given as paths, globs or a manifest) are read concurrently, reconciled to the raw
+# workbook schema, tagged with their site and source file, and deduplicated by
+# (Site, Info.ID) before preprocessing drops the identifier.
+#
+#     df = load_cohort("data/extracts/*/*.xlsx")
+#     df = load_cohort(manifest="data/extracts/manifest.json")
+
+import glob
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .data_loader import load_excel_dataset
+from .instrumentation import instrument
+from .preprocessing import LAB_COLUMNS
+from .utils import process_pool
+
+# Column layout of the cohort workbook; every source is reconciled to it
+RAW_COLUMNS = ['Info.ID', 'Name', 'Age', 'Sex', 'Occupation', 'Smoking', 'Marital status'] + \
+    LAB_COLUMNS + ['Dx', 'Indication']
+# A source without these cannot be preprocessed; other missing columns are added empty
+REQUIRED_COLUMNS = ['Age', 'Dx']
+SOURCE_COLUMNS = ['Site', 'Source']
+
+# Header spellings seen in other extracts, keyed by their normalised form (see _header_key)
+COLUMN_ALIASES = {
+    'id': 'Info.ID', 'patient id': 'Info.ID', 'info id': 'Info.ID',
+    'gender': 'Sex',
+    'marital': 'Marital status', 'marital state': 'Marital status',
+    'diagnosis': 'Dx', 'diagnostic': 'Dx',
+}
+
+FORMATS = {'.xlsx': 'excel', '.xlsm': 'excel', '.xls': 'excel', '.csv': 'csv',
+           '.parquet': 'parquet', '.pq': 'parquet'}
+
+
+@dataclass
+class Source:
+    """
+    One extract to ingest.
+
+    - path: File path
+    - site: Site label (default: the name of the file's parent directory, for the
+      <site>/<extract> layout)
+    - sheet_name: Excel sheet
+    - file_format: 'excel', 'csv' or 'parquet' (default: from the suffix)
+    - read_options: Extra keyword arguments for pd.read_csv / pd.read_parquet
+    """
+    path: str
+    site: str = None
+    sheet_name: str = 'Sheet1'
+    file_format: str = None
+    read_options: dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.site is None:
+            self.site = os.path.basename(os.path.dirname(os.path.abspath(self.path)))
+        if self.file_format is None:
+            suffix = os.path.splitext(self.path)[1].lower()
+            if suffix not in FORMATS:
+                raise ValueError(f"Cannot infer the format of '{self.path}'. Supported: {sorted(FORMATS)}")
+            self.file_format = FORMATS[suffix]
+
+    @property
+    def label(self) -> str:
+        return f"{self.path}:{self.sheet_name}" if self.file_format == 'excel' else self.path
+
+
+def _read_manifest(manifest: str) -> list:
+    """Entries of a JSON list or CSV manifest (columns path, site, sheet_name, file_format)."""
+    if manifest.lower().endswith(".json"):
+        with open(manifest) as f:
+            entries = json.load(f)
+    elif manifest.lower().endswith(".csv"):
+        entries = pd.read_csv(manifest, dtype=str).to_dict(orient='records')
+    else:
+        raise ValueError(f"Manifest must be a .json or .csv file, got '{manifest}'")
+
+    base = os.path.dirname(manifest)
+    sources = []
+    for entry in entries:
+        entry = {key: value for key, value in entry.items() if isinstance(value, (str, dict))}
+        if 'path' not in entry:
+            raise ValueError(f"Manifest entry without a path in {manifest}: {entry}")
+        entry['path'] = os.path.join(base, entry['path'])  # Absolute paths stay as they are
+        sources.append(Source(**entry))
+    return sources
+
+
+def resolve_sources(sources=None, manifest: str = None) -> list:
+    """
+    Expand paths, globs, Source objects, dicts and/or a manifest into Source objects,
+    in the given order (later sources win when deduplicating with keep='last').
+    Glob matches are sorted, so monthly extracts named by date come oldest first.
+    """
+    if isinstance(sources, (str, Source, dict)):
+        sources = [sources]
+    resolved = []
+    for item in sources or []:
+        if isinstance(item, Source):
+            resolved.append(item)
+        elif isinstance(item, dict):
+            resolved.append(Source(**item))
+        elif glob.has_magic(item):
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                raise ValueError(f"No files match '{item}'")
+            resolved.extend(Source(path) for path in matches)
+        else:
+            if not os.path.exists(item):
+                raise ValueError(f"Source file not found: {item}")
+            resolved.append(Source(item))
+    if manifest:
+        resolved.extend(_read_manifest(manifest))
+    if not resolved:
+        raise ValueError("No sources given: pass paths/globs or a manifest")
+    return resolved
+
+
+def _read_source(source: Source, use_cache: bool = True) -> pd.DataFrame:
+    if source.file_format == 'excel':
+        return load_excel_dataset(source.path, source.sheet_name, use_cache=use_cache)
+    if source.file_format == 'csv':
+        return pd.read_csv(source.path, **source.read_options)
+    if source.file_format == 'parquet':
+        return pd.read_parquet(source.path, **source.read_options)
+    raise ValueError(f"Unknown format '{source.file_format}'. Available: ['excel', 'csv', 'parquet']")
+
+
+def _header_key(name) -> str:
+    return re.sub(r'[\s._]+', ' ', str(name)).strip().lower()
+
+
+_CANONICAL = {**{_header_key(col): col for col in RAW_COLUMNS}, **COLUMN_ALIASES}
+
+
+def _normalize_ids(ids: pd.Series) -> pd.Series:
+    """IDs as trimmed strings, so 17172, 17172.0 and ' 17172' from different files compare equal."""
+    text = ids.astype(object).where(ids.notna(), None)
+    text = text.map(lambda v: v if v is None else str(v).strip())
+    return text.str.replace(r'\.0$', '', regex=True).astype('string')
+
+
+def reconcile_schema(df: pd.DataFrame, source: Source, verbose: bool = True) -> pd.DataFrame:
+    """
+    Bring one source to RAW_COLUMNS: match headers ignoring case, spacing, dots and
+    underscores (plus COLUMN_ALIASES), add missing optional columns as empty, drop
+    unknown ones, normalise Info.ID and append the Site and Source tags.
+    """
+    renamed = {}
+    for col in df.columns:
+        canonical = _CANONICAL.get(_header_key(col))
+        if canonical and canonical not in renamed.values():
+            renamed[col] = canonical
+    df = df.rename(columns=renamed)
+
+    missing_required = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_required:
+        raise ValueError(f"{source.label} is missing required columns {missing_required}")
+    missing = [col for col in RAW_COLUMNS if col not in df.columns]
+    extra = [col for col in df.columns if col not in RAW_COLUMNS]
+    if verbose and (missing or extra):
+        changes = ([f"added empty {missing}"] if missing else []) + ([f"dropped {extra}"] if extra else [])
+        print(f"⚠️ {source.label}: {', '.join(changes)}")
+
+    columns = {col: df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object)
+               for col in RAW_COLUMNS}
+    columns['Info.ID'] = _normalize_ids(columns['Info.ID'])
+    out = pd.DataFrame(columns, index=df.index)
+    out['Site'] = source.site
+    out['Source'] = source.label
+    return out
+
+
+def deduplicate_patients(df: pd.DataFrame, keep: str = 'last', key: list = ('Site', 'Info.ID')) -> pd.DataFrame:
+    """
+    Drop patients that reappear in a later (keep='last') or earlier (keep='first') source.
+
+    Rows are compared by `key` across sources only. Within one extract, Info.ID is a
+    record number that can repeat for different people (as in the reference workbook),
+    so a key that repeats inside any source does not identify one patient: all rows
+    with that key are kept, in every source. Rows with a missing ID are always kept.
+
+    Parameters:
+    - df (pd.DataFrame): Concatenated sources with a Source column, in source order
+    - keep (str): 'last' or 'first'
+    - key (tuple): Columns identifying a patient
+
+    Returns:
+    - pd.DataFrame
+    """
+    if keep not in ('last', 'first'):
+        raise ValueError(f"keep must be 'last' or 'first', got {keep!r}")
+    key = list(key)
+    order = pd.Series(pd.factorize(df['Source'])[0], index=df.index)
+    has_id = df[key].notna().all(axis=1)
+    repeated = df[has_id].duplicated(['Source'] + key, keep=False)
+    ambiguous = repeated.groupby([df.loc[has_id, col] for col in key]).transform('any')
+    unique = ambiguous.index[~ambiguous]
+
+    grouped = order[unique].groupby([df.loc[unique, col] for col in key])
+    chosen = grouped.transform('max' if keep == 'last' else 'min')
+    winner = pd.Series(True, index=df.index)
+    winner[unique] = order[unique] == chosen
+    return df[winner]
+
+
+@instrument
+def load_cohort(sources=None, manifest: str = None, dedupe: str = 'last', n_jobs: int = None,
+                executor: str = None, use_cache: bool = True, verbose: bool = True) -> pd.DataFrame:
+    """
+    Read several extracts concurrently into one raw cohort frame ready for PreprocessingPlan.
+
+    Parameters:
+    - sources: Path, glob ('data/extracts/*/*.xlsx'), Source, dict, or a list of those
+    - manifest (str): JSON list / CSV of {path, site, sheet_name, file_format} entries;
+      relative paths are resolved against the manifest's directory
+    - dedupe (str): 'last' keeps a patient's row(s) from the latest source that has them,
+      'first' from the earliest, None keeps everything (see deduplicate_patients)
+    - n_jobs (int): Concurrent readers (default: one per source, capped at the CPU count)
+    - executor (str): 'process' or 'thread'. Default: processes when two or more sources
+      are Excel workbooks (openpyxl parsing holds the GIL), threads otherwise
+    - use_cache (bool): Use the Arrow cache of load_excel_dataset for workbooks
+    - verbose (bool): Print schema fixes, per-source row counts and the deduplication summary
+
+    Returns:
+    - pd.DataFrame: RAW_COLUMNS plus categorical Site and Source columns, with a fresh index
+    """
+    resolved = resolve_sources(sources, manifest)
+    if executor is None:
+        executor = 'process' if sum(s.file_format == 'excel' for s in resolved) > 1 else 'thread'
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"executor must be 'process' or 'thread', got {executor!r}")
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(resolved)))
+
+    if n_jobs == 1:
+        frames = [_read_source(source, use_cache) for source in resolved]
+    else:
+        pool = process_pool(n_jobs) if executor == 'process' else ThreadPoolExecutor(max_workers=n_jobs)
+        with pool:
+            frames = list(pool.map(_read_source, resolved, [use_cache] * len(resolved)))
+
+    frames = [reconcile_schema(frame, source, verbose) for frame, source in zip(frames, resolved)]
+    if verbose:
+        for frame, source in zip(frames, resolved):
+            print(f"📥 {source.site}: {len(frame)} rows from {source.label}")
+    df = pd.concat(frames, ignore_index=True)
+    for col in SOURCE_COLUMNS:
+        df[col] = pd.Categorical(df[col], categories=list(dict.fromkeys(df[col])))
+
+    if dedupe:
+        n_before = len(df)
+        df = deduplicate_patients(df, keep=dedupe).reset_index(drop=True)
+        if verbose:
+            print(f"🧹 Dropped {n_before - len(df)} rows of patients repeated in another extract "
+                  f"(kept {dedupe}); {len(df)} rows from {len(resolved)} sources")
+    return df
+
+
+def sources_fingerprint(sources=None, manifest: str = None) -> str:
+    """Content hash of every resolved source and its site/sheet (for caching downstream results)."""
+    import hashlib
+    from .data_loader import _file_digest
+
+    digest = hashlib.sha256()
+    for source in resolve_sources(sources, manifest):
+        digest.update(f"{source.site}:{source.sheet_name}:{source.file_format}:{_file_digest(source.path)}".encode())
+    return digest.hexdigest()
@@ -0,0 +1,286 @@
+# src/thyroid_analysis/instrumentation.py
+#
+# Lightweight stage instrumentation. Public functions are wrapped with @instrument;
+# when tracing is on, every call appends one JSON line with wall time, CPU time, RSS
+# and the row/column counts of its first frame argument and of its result. Tracing is
+# off by default and then costs one flag check per call.
+#
+#     THYROID_TRACE=outputs/traces/run.jsonl python src/main.py
+#     THYROID_PROFILE=preprocessing.PreprocessingPlan.transform   # cProfile this stage
+#     THYROID_TRACEMALLOC=imputation.run_imputers                 # allocation peak/retained sites
+#     python -m thyroid_analysis.instrumentation outputs/traces/run.jsonl   # summary table
+#
+# The settings live in environment variables so worker processes inherit them.
+
+import contextvars
+import functools
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Optional: Not available on Windows; RSS fields are then omitted
+
+TRACE_ENV = "THYROID_TRACE"
+PROFILE_ENV = "THYROID_PROFILE"
+TRACEMALLOC_ENV = "THYROID_TRACEMALLOC"
+DEFAULT_PROFILE_DIR = "outputs/traces/profiles"
+
+_write_lock = threading.Lock()
+_parent = contextvars.ContextVar("thyroid_stage", default=None)
+# tracemalloc is process-wide: spans selected for it share one peak counter, so the
+# active ones are tracked to avoid resetting each other's peak and to flag overlaps
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_spans = set()
+_tracemalloc_owned = False
+
+
+def _names(value: str) -> set:
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+class _Settings:
+    def __init__(self):
+        self.reload()
+
+    def reload(self):
+        self.path = os.environ.get(TRACE_ENV) or None
+        self.profile = _names(os.environ.get(PROFILE_ENV))
+        self.tracemalloc = _names(os.environ.get(TRACEMALLOC_ENV))
+        self.enabled = bool(self.path or self.profile or self.tracemalloc)
+
+
+settings = _Settings()
+
+
+def configure(path: str = None, profile=(), tracemalloc=()):
+    """
+    Turn tracing on or off for this process and the processes it starts.
+
+    Parameters:
+    - path (str): JSON-lines file to append records to (None disables the trace file)
+    - profile (iterable): Stage names to run under cProfile ('*' for all); the .prof
+      files go to outputs/traces/profiles and their paths into the records
+    - tracemalloc (iterable): Stage names whose traced allocation peak and largest
+      retained allocation sites are recorded ('*' for all)
+    """
+    for env, value in ((TRACE_ENV, path), (PROFILE_ENV, ",".join(profile)),
+                       (TRACEMALLOC_ENV, ",".join(tracemalloc))):
+        if value:
+            os.environ[env] = value
+        else:
+            os.environ.pop(env, None)
+    settings.reload()
+
+
+def _rss_mb():
+    """(current RSS, process peak RSS) in MB."""
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        pass
+    peak = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+    return current, peak
+
+
+def _shape(value):
+    """(rows, columns) of a DataFrame/array, or of the first one inside a tuple/list/dict."""
+    if isinstance(value, dict):
+        value = next(iter(value.values()), None)
+    elif isinstance(value, (tuple, list)) and value and not hasattr(value, "shape"):
+        value = value[0]
+    shape = getattr(value, "shape", None)
+    if not isinstance(shape, tuple) or not shape:
+        return None, None
+    return int(shape[0]), int(shape[1]) if len(shape) > 1 else 1
+
+
+def _selected(name: str, names: set) -> bool:
+    return "*" in names or name in names
+
+
+def _emit(record: dict):
+    if not settings.path:
+        return
+    import json
+
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        os.makedirs(os.path.dirname(settings.path) or ".", exist_ok=True)
+        with open(settings.path, "a") as f:
+            f.write(line + "\n")
+
+
+class stage:
+    """
+    Context manager recording one stage. Extra fields can be attached to the record
+    while the stage runs (e.g. `with stage("kl", bins=20) as record: record['rows'] = n`).
+    Does nothing when tracing is off.
+
+    cpu_s is the CPU time of the calling thread, so stages running concurrently in
+    other threads are not counted; work in threads or processes the stage starts is
+    not counted either. The parent stage is read from a ContextVar: code handing work
+    to other threads must run it in contextvars.copy_context() to keep the link.
+    tracemalloc keeps one process-wide peak, so a stage that overlaps another traced
+    stage (a nested call, or another thread) is marked 'tracemalloc_overlap' and its
+    traced_peak_mb may include the other stage's allocations.
+    """
+
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.record = {'stage': name, **fields}
+
+    def __enter__(self) -> dict:
+        if not settings.enabled:
+            return self.record
+        self.record.update({'parent': _parent.get(), 'pid': os.getpid(),
+                            'thread': threading.current_thread().name, 'started': time.time()})
+        self._token = _parent.set(self.name)
+        rss, peak = _rss_mb()
+        self._rss, self._peak = rss, peak
+
+        self._profiler = None
+        if _selected(self.name, settings.profile):
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if _selected(self.name, settings.tracemalloc):
+            self._start_tracemalloc()
+
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self.record
+
+    def _start_tracemalloc(self):
+        global _tracemalloc_owned
+        import tracemalloc
+
+        self._thread = threading.get_ident()
+        with _tracemalloc_lock:
+            if _tracemalloc_spans:
+                # Resetting the peak now would corrupt the running spans' peaks; an outer
+                # span in this thread includes this one, so only it keeps a clean peak
+                self.record['tracemalloc_overlap'] = True
+                for other in _tracemalloc_spans:
+                    if other._thread != self._thread:
+                        other.record['tracemalloc_overlap'] = True
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    _tracemalloc_owned = True
+                tracemalloc.reset_peak()
+            _tracemalloc_spans.add(self)
+
+    def _stop_tracemalloc(self):
+        global _tracemalloc_owned
+        import tracemalloc
+
+        with _tracemalloc_lock:
+            _tracemalloc_spans.discard(self)
+            _, peak = tracemalloc.get_traced_memory()
+            self.record['traced_peak_mb'] = round(peak / 2**20, 3)
+            # Sites still holding memory when the stage ends (the peak itself is not attributed)
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:5]
+            self.record['retained_allocations'] = [
+                f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size / 2**20:.2f} MB" for s in stats]
+            if not _tracemalloc_spans and _tracemalloc_owned:
+                tracemalloc.stop()
+                _tracemalloc_owned = False
+
+    def __exit__(self, exc_type, exc, tb):
+        if not settings.enabled:
+            return False
+        wall = time.perf_counter() - self._wall
+        cpu = time.thread_time() - self._cpu
+        record = self.record
+        record.update({'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                       'status': 'error' if exc_type else 'ok'})
+        if exc_type:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(DEFAULT_PROFILE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_PROFILE_DIR, f"{self.name}-{os.getpid()}-{int(record['started'] * 1000)}.prof")
+            self._profiler.dump_stats(path)
+            record['profile'] = path
+        if _selected(self.name, settings.tracemalloc):
+            self._stop_tracemalloc()
+
+        rss, peak = _rss_mb()
+        if rss is not None:
+            record['rss_mb'] = round(rss, 1)
+            record['rss_delta_mb'] = round(rss - self._rss, 1)
+        if peak is not None:
+            record['peak_rss_mb'] = round(peak, 1)
+            # Non-zero only when this stage raised the process high-water mark
+            record['peak_rss_growth_mb'] = round(peak - self._peak, 1)
+        _parent.reset(self._token)
+        _emit(record)
+        return False
+
+
+def instrument(func=None, *, name: str = None):
+    """
+    Decorator recording each call of a function as a stage named '<module>.<qualname>'
+    (without the package prefix), plus the shape of the first frame/array argument
+    ('rows', 'columns') and of the result ('out_rows', 'out_columns').
+    """
+    if func is None:
+        return functools.partial(instrument, name=name)
+    stage_name = name or f"{func.__module__.replace('thyroid_analysis.', '', 1)}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.enabled:
+            return func(*args, **kwargs)
+        with stage(stage_name) as record:
+            for value in list(args) + list(kwargs.values()):
+                rows, columns = _shape(value)
+                if rows is not None:
+                    record['rows'], record['columns'] = rows, columns
+                    break
+            result = func(*args, **kwargs)
+            rows, columns = _shape(result)
+            if rows is not None:
+                record['out_rows'], record['out_columns'] = rows, columns
+            return result
+
+    return wrapper
+
+
+def summarize_trace(path: str):
+    """
+    Per-stage totals from a JSON-lines trace: calls, total/mean wall and CPU seconds,
+    the largest peak RSS growth and the largest input, sorted by total wall time.
+    """
+    import pandas as pd
+
+    records = pd.read_json(path, lines=True)
+    agg = {'calls': ('wall_s', 'size'), 'wall_s': ('wall_s', 'sum'), 'mean_wall_s': ('wall_s', 'mean'),
+           'cpu_s': ('cpu_s', 'sum')}
+    if 'peak_rss_growth_mb' in records:
+        agg['max_peak_rss_growth_mb'] = ('peak_rss_growth_mb', 'max')
+    if 'rows' in records:
+        agg['max_rows'] = ('rows', 'max')
+    if 'status' in records:
+        agg['errors'] = ('status', lambda s: int((s == 'error').sum()))
+    return records.groupby('stage').agg(**agg).sort_values('wall_s', ascending=False)
+
+
+if __name__ == "__main__":
+    import sys
+
+    import pandas as pd
+
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m thyroid_analysis.instrumentation TRACE.jsonl")
+    with pd.option_context('display.width', 200, 'display.max_rows', 200, 'display.max_columns', 20):
+        print(summarize_trace(sys.argv[1]))
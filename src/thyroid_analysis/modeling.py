@@ -1 +1,190 @@
-from thyroid_analysis import config  # All imports available
+# src/thyroid_analysis/modeling.py
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from thyroid_analysis import config  # All names resolved lazily on first use
+from .instrumentation import instrument
+from .utils import attach_shared_array, process_pool, share_array
+
+TARGET = 'Diagnostic Group Code'
+DEFAULT_CACHE_DIR = "outputs/cache/cv"
+DEFAULT_RESULTS_PATH = "outputs/pipeline_results.csv"
+
+# name -> (config attribute, constructor params); resolved in the worker that fits it
+MODEL_ZOO = {
+    'LogisticRegression': ('LogisticRegression', {'max_iter': 1000}),
+    'DecisionTree': ('DecisionTreeClassifier', {'random_state': 42}),
+    'RandomForest': ('RandomForestClassifier', {'n_estimators': 200, 'random_state': 42}),
+    'GradientBoosting': ('GradientBoostingClassifier', {'random_state': 42}),
+    'AdaBoost': ('AdaBoostClassifier', {'random_state': 42}),
+    'XGBoost': ('XGBClassifier', {'eval_metric': 'mlogloss', 'random_state': 42}),
+    'LightGBM': ('LGBMClassifier', {'random_state': 42, 'verbose': -1}),
+    'CatBoost': ('CatBoostClassifier', {'random_state': 42, 'verbose': 0}),
+    'GaussianNB': ('GaussianNB', {}),
+    'SVC': ('SVC', {'probability': True, 'random_state': 42}),
+    'MLP': ('MLPClassifier', {'max_iter': 500, 'random_state': 42}),
+}
+
+METRIC_COLUMNS = ['accuracy', 'precision_macro', 'recall_macro', 'f1_macro',
+                  'precision_weighted', 'recall_weighted', 'f1_weighted']
+
+
+def available_models(models: list = None) -> list:
+    """Models from the zoo whose backend can be imported here (e.g. skips XGBoost without xgboost)."""
+    usable = []
+    for name in models or MODEL_ZOO:
+        try:
+            config.load(MODEL_ZOO[name][0])
+            usable.append(name)
+        except ImportError:
+            print(f"⚠️ Skipping {name}: backend not installed")
+    return usable
+
+
+def build_pipeline(model_name: str, smote: bool = True, k_neighbors: int = 5, random_state: int = 42):
+    """Scaler -> SMOTE -> model; with imblearn's Pipeline SMOTE only ever sees training folds."""
+    from imblearn.pipeline import Pipeline
+
+    estimator, params = MODEL_ZOO[model_name]
+    steps = [('scaler', config.StandardScaler())]
+    if smote:
+        steps.append(('smote', config.SMOTE(k_neighbors=k_neighbors, random_state=random_state)))
+    steps.append(('model', config.load(estimator)(**params)))
+    return Pipeline(steps)
+
+
+def _fold_key(data_hash, model_name, fold, n_splits, smote, random_state) -> str:
+    payload = json.dumps([data_hash, model_name, MODEL_ZOO[model_name], fold, n_splits, smote, random_state],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+
+def _run_fold(x_spec, y_spec, train_idx, test_idx, model_name, smote, random_state):
+    """Worker: fit one model on one fold and score it, with fit/predict timings."""
+    x_shm, X = attach_shared_array(x_spec)
+    y_shm, y = attach_shared_array(y_spec)
+    try:
+        X_train, y_train = X[train_idx], y[train_idx]
+        smallest = np.bincount(y_train).astype(float)
+        smallest = int(smallest[smallest > 0].min())
+        use_smote = smote and smallest > 1
+        pipeline = build_pipeline(model_name, use_smote, min(5, smallest - 1), random_state)
+
+        start = time.perf_counter()
+        pipeline.fit(X_train, y_train)
+        fit_time = time.perf_counter() - start
+        start = time.perf_counter()
+        y_pred = pipeline.predict(X[test_idx])
+        predict_time = time.perf_counter() - start
+
+        y_test = y[test_idx]
+        labels = np.unique(y)
+        result = {'fit_time': fit_time, 'predict_time': predict_time,
+                  'accuracy': config.accuracy_score(y_test, y_pred),
+                  'confusion_matrix': config.confusion_matrix(y_test, y_pred, labels=labels).tolist()}
+        for average in ('macro', 'weighted'):
+            for metric in ('precision', 'recall', 'f1'):
+                scorer = config.load(f"{metric}_score")
+                result[f"{metric}_{average}"] = scorer(y_test, y_pred, average=average, zero_division=0)
+        return result
+    finally:
+        x_shm.close()
+        y_shm.close()
+
+
+@instrument
+def train_and_evaluate(datasets: dict, feature_sets: dict = None, models: list = None,
+                       target: str = TARGET, n_splits: int = 5, smote: bool = True,
+                       n_jobs: int = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                       output_path: str = DEFAULT_RESULTS_PATH, random_state: int = 42) -> pd.DataFrame:
+    """
+    Run the model zoo under stratified K-fold CV on each imputed dataset.
+
+    Every (dataset, feature set, model, fold) is an independent task scheduled on a
+    process pool; the data of each dataset/feature set lives in shared memory once.
+    Fold results are cached on disk keyed on the data hash, model, params and fold,
+    so re-runs only fit what changed.
+
+    Parameters:
+    - datasets (dict): {name: imputed DataFrame}, e.g. {'KNN': df_knn, 'MICE': df_mice}
+    - feature_sets (dict): {feature method: columns}, e.g. the consensus biomarkers
+      (default: {'All': every numeric non-target column})
+    - models (list): Names from MODEL_ZOO (default: all with an installed backend)
+    - target (str): Label column; rows without a label are dropped
+    - n_splits (int): Stratified folds
+    - smote (bool): Oversample minority classes inside each training fold
+    - n_jobs (int): Worker processes (default: CPU count)
+    - cache_dir (str): Per-fold result cache (None disables caching)
+    - output_path (str): CSV for the aggregated results (None skips writing)
+    - random_state (int): Seed for the folds and SMOTE
+
+    Returns:
+    - pd.DataFrame: One row per dataset/feature method/model with mean fold metrics,
+      summed confusion matrix and mean fit/predict times
+    """
+    import joblib
+
+    models = available_models(models)
+    tasks, shared, cached = [], [], {}
+    try:
+        for dataset_name, df in datasets.items():
+            df = df.dropna(subset=[target])
+            y = df[target].to_numpy().astype(int)
+            sets = feature_sets or {'All': [c for c in df.select_dtypes(include=[np.number]).columns if c != target]}
+            for feature_method, columns in sets.items():
+                X = df[columns].to_numpy(dtype=float)
+                data_hash = hashlib.sha256(X.tobytes() + y.tobytes() + json.dumps(columns).encode()).hexdigest()
+                folds = list(config.StratifiedKFold(n_splits=n_splits, shuffle=True,
+                                                    random_state=random_state).split(X, y))
+                x_shm, x_spec = share_array(X)
+                y_shm, y_spec = share_array(y)
+                shared += [x_shm, y_shm]
+                for model_name in models:
+                    for fold, (train_idx, test_idx) in enumerate(folds):
+                        group = (dataset_name, feature_method, model_name)
+                        key = _fold_key(data_hash, model_name, fold, n_splits, smote, random_state)
+                        path = os.path.join(cache_dir, f"{key}.joblib") if cache_dir else None
+                        if path and os.path.exists(path):
+                            cached.setdefault(group, []).append(joblib.load(path))
+                            continue
+                        tasks.append((group, path, (x_spec, y_spec, train_idx, test_idx,
+                                                    model_name, smote, random_state)))
+
+        print(f"🏋️ Training {len(tasks)} model folds ({sum(len(v) for v in cached.values())} cached)")
+        fold_results = dict((group, list(results)) for group, results in cached.items())
+        if tasks:
+            with process_pool(n_jobs or os.cpu_count() or 1) as pool:
+                futures = [(group, path, pool.submit(_run_fold, *args)) for group, path, args in tasks]
+                for group, path, future in futures:
+                    result = future.result()
+                    if path:
+                        os.makedirs(cache_dir, exist_ok=True)
+                        joblib.dump(result, path)
+                    fold_results.setdefault(group, []).append(result)
+    finally:
+        for shm in shared:
+            shm.close()
+            shm.unlink()
+
+    rows = []
+    for (dataset_name, feature_method, model_name), results in fold_results.items():
+        row = {'dataset': dataset_name, 'model': model_name}
+        for metric in METRIC_COLUMNS + ['fit_time', 'predict_time']:
+            row[metric] = float(np.mean([r[metric] for r in results]))
+        row['confusion_matrix'] = np.sum([r['confusion_matrix'] for r in results], axis=0).tolist()
+        row['feature_method'] = feature_method
+        rows.append(row)
+    results_df = pd.DataFrame(rows, columns=['dataset', 'model'] + METRIC_COLUMNS +
+                              ['confusion_matrix', 'feature_method', 'fit_time', 'predict_time'])
+
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        results_df.to_csv(output_path, index=False)
+        print(f"✅ Model results saved to: {output_path}")
+    return results_df
@@ -1,4 +1,487 @@
+# src/thyroid_analysis/pipeline.py
+#
+# The analysis as a declarative stage graph. Each Stage names its inputs; the runner
+# executes independent branches concurrently and caches stage outputs on disk under a
+# content address: hash(stage code, params, content hashes of its inputs). Re-running
+# after a change (e.g. the KL bin count) only recomputes the stages it reaches.
+#
+#     python -m thyroid_analysis.pipeline                      # everything
+#     python -m thyroid_analysis.pipeline kl_report --bins 30  # KL branch only
+#     python -m thyroid_analysis.pipeline --force impute_knn   # recompute one stage
+#     python -m thyroid_analysis.pipeline --list
+#     python -m thyroid_analysis.pipeline --sources "data/extracts/*/*.xlsx"  # multi-site cohort
+
+import argparse
+import contextvars
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable
+
 from .data_loader import load_excel_dataset
+from .instrumentation import configure, instrument, stage as trace_stage
+from .utils import process_pool
 
 file_path = 'data/ExactRealDatasetLU.xlsx'
-df = load_excel_dataset(file_path)
+DEFAULT_CACHE_DIR = "outputs/cache/pipeline"
+
+CATEGORICAL_COLUMNS = ['Sex', 'Smoking', 'Marital status']
+NUMERICAL_COLUMNS = ['Age', 'first TSH', 'last TSH', 'first T3', 'last T3', 'first T4', 'last T4',
+                     'Smoking', 'Marital status', 'first FT3', 'last FT3']
+COLUMNS_TO_COMPARE = NUMERICAL_COLUMNS
+COMPARISON_DIR = "outputs/eda/imputed"
+
+
+def load_default_dataset(path: str = file_path):
+    """Load the default cohort workbook. Called explicitly; nothing is read at import time."""
+    return load_excel_dataset(path)
+
+
+# =========== Stage graph ===========
+
+@dataclass
+class Stage:
+    """
+    One node of the pipeline.
+
+    - name: Unique stage name (also the CLI name)
+    - func: Module-level function func(*input results, **params) -> result
+    - inputs: Names of the stages whose results are passed positionally
+    - params: Keyword arguments (JSON-serialisable; part of the cache key)
+    - cache: Persist the result on disk; side-effect stages (plots, files) set False
+    - process: Run func in the runner's process pool instead of a thread
+    - workers: func starts its own worker processes and takes an n_jobs keyword; the
+      runner passes it a share of its worker budget (not part of the cache key)
+    - fingerprint: Optional params -> str for external inputs, e.g. a file digest
+    """
+    name: str
+    func: Callable
+    inputs: tuple = ()
+    params: dict = field(default_factory=dict)
+    cache: bool = True
+    process: bool = False
+    workers: bool = False
+    fingerprint: Callable = None
+
+
+def _code_version(func: Callable) -> str:
+    """Hash of the function source, so editing a stage invalidates its cached results."""
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = f"{func.__module__}.{func.__qualname__}"
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+class WorkerBudget:
+    """
+    Worker processes shared by concurrently running stages, so overlapping branches
+    never run more than `total` processes between them. reserve() blocks until at
+    least one worker is free and grants up to the number asked for.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self._free = total
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserve(self, wanted: int = None):
+        wanted = max(1, min(wanted or self.total, self.total))
+        with self._condition:
+            self._condition.wait_for(lambda: self._free > 0)
+            granted = min(wanted, self._free)
+            self._free -= granted
+        try:
+            yield granted
+        finally:
+            with self._condition:
+                self._free += granted
+                self._condition.notify_all()
+
+
+class PipelineRunner:
+    """
+    Runs a stage graph with content-addressed caching.
+
+    Parameters:
+    - stages (list): Stage objects
+    - cache_dir (str): Where cached results ({key}.joblib + {key}.json) are kept
+    - n_jobs (int): Worker processes shared by process stages and the pools of workers
+      stages (default: CPU count)
+    - use_cache (bool): False recomputes and stores nothing
+    """
+
+    def __init__(self, stages: list, cache_dir: str = DEFAULT_CACHE_DIR, n_jobs: int = None,
+                 use_cache: bool = True):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name '{stage.name}'")
+            self.stages[stage.name] = stage
+        for stage in stages:
+            unknown = [dep for dep in stage.inputs if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {unknown}")
+        self.order = self._topological_order()
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.use_cache = use_cache
+        self._keys, self._results = {}, {}
+        self._lock = threading.Lock()
+
+    def _topological_order(self) -> list:
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in pipeline: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in self.stages[name].inputs:
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def upstream(self, targets: list) -> list:
+        """Targets plus everything they depend on, in execution order."""
+        unknown = [name for name in targets if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stages: {unknown}. Available: {self.order}")
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].inputs)
+        return [name for name in self.order if name in needed]
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.joblib", f"{base}.json"
+
+    def _key(self, stage: Stage, outputs: dict) -> str:
+        payload = [stage.name, _code_version(stage.func), stage.params,
+                   [outputs[dep] for dep in stage.inputs],
+                   stage.fingerprint(stage.params) if stage.fingerprint else None]
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+    def result(self, name: str):
+        """Result of a stage from the last run, loaded from the cache when it was not recomputed."""
+        import joblib
+
+        with self._lock:
+            if name not in self._results:
+                if name not in self._keys:
+                    raise ValueError(f"Stage '{name}' has not been run")
+                self._results[name] = joblib.load(self._paths(self._keys[name])[0])
+            return self._results[name]
+
+    def _execute(self, stage: Stage, outputs: dict, force: set, processes, budget: WorkerBudget):
+        """Run or reuse one stage; returns (content hash of its output, 'ran' | 'cached')."""
+        import joblib
+
+        key = self._key(stage, outputs)
+        self._keys[stage.name] = key
+        data_path, meta_path = self._paths(key)
+        if stage.cache and self.use_cache and stage.name not in force and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            print(f"♻️ {stage.name}: cached ({key[:12]})")
+            with trace_stage(f"pipeline.{stage.name}", cached=True):
+                pass
+            return meta['output'], 'cached'
+
+        args = [self.result(dep) for dep in stage.inputs]
+        start = time.perf_counter()
+        # Process stages are measured here as seen from the parent; the instrumented
+        # functions they call also write their own records from the worker
+        with trace_stage(f"pipeline.{stage.name}", cached=False, process=stage.process):
+            if stage.process:
+                with budget.reserve(1):
+                    result = processes.submit(stage.func, *args, **stage.params).result()
+            elif stage.workers:
+                with budget.reserve() as n_jobs:
+                    result = stage.func(*args, n_jobs=n_jobs, **stage.params)
+            else:
+                result = stage.func(*args, **stage.params)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._results[stage.name] = result
+
+        # Uncached stages are addressed by their inputs; cached ones by what they produced,
+        # so a forced re-run with an identical result keeps downstream caches valid
+        output = key
+        if stage.cache:
+            output = joblib.hash(result)
+            if self.use_cache:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                joblib.dump(result, data_path)
+                with open(meta_path, "w") as f:
+                    json.dump({'stage': stage.name, 'output': output, 'seconds': elapsed,
+                               'created': datetime.datetime.now().isoformat(timespec='seconds')}, f)
+        print(f"✅ {stage.name}: {elapsed:.2f}s")
+        return output, 'ran'
+
+    def _release(self, name: str, remaining: int, targets: set):
+        """
+        Drop a finished stage's in-memory result once nothing in this run still needs it,
+        so the raw, cleaned and imputed frames are not all held at once. Only results
+        that are on disk are dropped; result() reloads them on demand.
+        """
+        if remaining or name in targets or not (self.stages[name].cache and self.use_cache):
+            return
+        with self._lock:
+            self._results.pop(name, None)
+
+    def run(self, targets: list = None, force: list = ()) -> dict:
+        """
+        Run the target stages and whatever they need; stages become ready as soon as
+        their inputs are done, so independent branches overlap. Stages run in threads;
+        process and workers stages share one budget of n_jobs worker processes, and
+        every pool starts its workers from a forkserver rather than forking a thread.
+
+        Parameters:
+        - targets (list): Stage names (default: every stage)
+        - force (list): Stages to recompute even when cached
+
+        Returns:
+        - dict: {stage: 'ran' | 'cached'} in execution order
+        """
+        needed = self.upstream(list(targets or self.order))
+        force = set(force)
+        unknown = force - set(self.stages)
+        if unknown:
+            raise ValueError(f"Unknown stages to force: {sorted(unknown)}")
+
+        outputs, status, pending, running = {}, {}, list(needed), {}
+        targets = set(targets or self.order)
+        consumers = {name: sum(name in self.stages[other].inputs for other in needed) for name in needed}
+        budget = WorkerBudget(self.n_jobs)
+        with ThreadPoolExecutor(max_workers=len(needed)) as threads, process_pool(self.n_jobs) as processes:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if all(dep in outputs for dep in stage.inputs):
+                        pending.remove(name)
+                        # A fresh context copy per stage carries the tracing parent into the thread
+                        context = contextvars.copy_context()
+                        running[threads.submit(context.run, self._execute, stage, dict(outputs), force,
+                                               processes, budget)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    outputs[name], status[name] = future.result()
+                    for dep in self.stages[name].inputs:
+                        consumers[dep] -= 1
+                        self._release(dep, consumers[dep], targets)
+        return {name: status[name] for name in needed}
+
+
+# =========== Thyroid analysis stages ===========
+
+def _file_fingerprint(params: dict) -> str:
+    from .data_loader import _file_digest
+    return _file_digest(params['path'])
+
+
+def stage_load(path: str):
+    return load_excel_dataset(path)
+
+
+def _sources_fingerprint(params: dict) -> str:
+    from .ingestion import sources_fingerprint
+    return sources_fingerprint(params['sources'], params['manifest'])
+
+
+def stage_load_cohort(sources: list, manifest: str, n_jobs: int = None):
+    from .ingestion import load_cohort
+    return load_cohort(sources, manifest, n_jobs=n_jobs)
+
+
+def stage_clean(df_raw):
+    from .preprocessing import PreprocessingPlan
+    return PreprocessingPlan(compact=True, verbose=1).fit_transform(df_raw)
+
+
+def stage_eda_figures(df, categorical_columns: list, numerical_columns: list, n_jobs: int = None):
+    from .eda import (print_frequency_tables, categorical_figure_specs,
+                      numerical_figure_specs, missing_data_figure_spec)
+    from .rendering import render_figures
+
+    print_frequency_tables(df, categorical_columns)
+    specs = categorical_figure_specs(df, categorical_columns, save_dir="outputs/eda")
+    specs += numerical_figure_specs(df, numerical_columns, save_dir="outputs/eda")
+    specs.append(missing_data_figure_spec(df, stage="before", save_dir=COMPARISON_DIR))
+    return render_figures(specs, n_jobs=n_jobs)
+
+
+def stage_charts(df, columns: list):
+    from .charts import export_bar_charts
+    return export_bar_charts(df, columns, out_dir="outputs/charts")
+
+
+def stage_impute(df, method: str):
+    from .imputation import run_imputers
+    from .preprocessing import compact_dtypes
+
+    imputed, _ = run_imputers(df, imputers=[method])
+    # Imputed columns come back as float64; store them as float32 like the cleaned labs
+    return compact_dtypes(imputed[method])
+
+
+def stage_missing_figures(df_knn, df_mice, n_jobs: int = None):
+    from .eda import missing_data_figure_spec
+    from .rendering import render_figures
+
+    return render_figures([missing_data_figure_spec(df_knn, stage="after_knn", save_dir=COMPARISON_DIR),
+                           missing_data_figure_spec(df_mice, stage="after_mice", save_dir=COMPARISON_DIR)],
+                          n_jobs=n_jobs)
+
+
+def stage_comparison(df_original, df_knn, df_mice, columns: list, output_dir: str = "outputs/datasets"):
+    from .dataset_writer import write_comparison
+
+    # Long form, streamed one feature at a time: read one feature or only the imputed
+    # cells back with read_dataset(filters=...)
+    path = write_comparison(df_original, {'KNN Imputed': df_knn, 'MICE Imputed': df_mice}, columns,
+                            os.path.join(output_dir, "imputation_comparison.parquet"))
+
+    print("\n🔍 Imputed cells per feature:")
+    print(df_original[columns].isna().sum().rename('count'))
+    return path
+
+
+def stage_save_datasets(df_knn, df_mice, output_dir: str = "outputs/datasets"):
+    from .dataset_writer import write_dataset
+
+    return {name: write_dataset(df, os.path.join(output_dir, f"real_dataset_{name}_imputed.parquet"))
+            for name, df in (('knn', df_knn), ('mice', df_mice))}
+
+
+def stage_kl(df_original, df_knn, df_mice, columns: list, bins: int):
+    from .KL_divergence import compute_kl_for_all_features
+    return compute_kl_for_all_features(df_original, df_knn, df_mice, columns, bins=bins)
+
+
+def stage_kl_report(kl_df):
+    from .KL_divergence import plot_kl_divergence
+
+    plot_kl_divergence(kl_df)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    kl_output_path = os.path.join(COMPARISON_DIR, f"kl_divergence_comparison_{timestamp}.csv")
+    kl_df.to_csv(kl_output_path, index=False)
+    print(f"✅ KL divergence results saved to: {kl_output_path}")
+    return kl_output_path
+
+
+def stage_train(df_knn, df_mice, n_jobs: int = None):
+    from .modeling import train_and_evaluate
+    return train_and_evaluate({'KNN': df_knn, 'MICE': df_mice}, output_path="outputs/pipeline_results.csv",
+                              n_jobs=n_jobs)
+
+
+def build_stages(path: str = file_path, bins: int = 20, sources: list = None, manifest: str = None) -> list:
+    """
+    The stage graph of the thyroid analysis (what `main.py` runs). With sources or a
+    manifest the cohort is ingested from several extracts (see ingestion.load_cohort)
+    instead of the single workbook at path.
+    """
+    if sources or manifest:
+        load = Stage('load', stage_load_cohort, params={'sources': list(sources or []), 'manifest': manifest},
+                     cache=False, workers=True, fingerprint=_sources_fingerprint)
+    else:
+        load = Stage('load', stage_load, params={'path': path}, cache=False, fingerprint=_file_fingerprint)
+    return [
+        load,
+        Stage('clean', stage_clean, ('load',)),
+        Stage('eda_figures', stage_eda_figures, ('clean',), cache=False, workers=True,
+              params={'categorical_columns': CATEGORICAL_COLUMNS, 'numerical_columns': NUMERICAL_COLUMNS}),
+        Stage('charts', stage_charts, ('clean',), {'columns': ['Dx', 'Sex', 'Diagnostic Group']}, cache=False),
+        Stage('impute_knn', stage_impute, ('clean',), {'method': 'knn'}, process=True),
+        Stage('impute_mice', stage_impute, ('clean',), {'method': 'mice'}, process=True),
+        Stage('missing_figures', stage_missing_figures, ('impute_knn', 'impute_mice'), cache=False, workers=True),
+        Stage('comparison', stage_comparison, ('clean', 'impute_knn', 'impute_mice'),
+              {'columns': COLUMNS_TO_COMPARE}, cache=False),
+        Stage('save_datasets', stage_save_datasets, ('impute_knn', 'impute_mice'), cache=False),
+        Stage('kl', stage_kl, ('clean', 'impute_knn', 'impute_mice'), {'columns': COLUMNS_TO_COMPARE, 'bins': bins}),
+        Stage('kl_report', stage_kl_report, ('kl',), cache=False),
+        Stage('train', stage_train, ('impute_knn', 'impute_mice'), cache=False, workers=True),
+    ]
+
+
+@instrument(name="pipeline.run_pipeline")  # Not '__main__' when run with -m
+def run_pipeline(targets: list = None, force: list = (), path: str = file_path, bins: int = 20,
+                 cache_dir: str = DEFAULT_CACHE_DIR, n_jobs: int = None, use_cache: bool = True,
+                 sources: list = None, manifest: str = None) -> PipelineRunner:
+    """
+    Run (part of) the thyroid analysis graph.
+
+    Parameters:
+    - targets (list): Stages to produce (default: all); their upstream stages run or come from cache
+    - force (list): Stages to recompute regardless of the cache
+    - path (str): Cohort workbook
+    - bins (int): Histogram bins for the KL stage
+    - cache_dir (str): Stage result cache
+    - n_jobs (int): Worker processes shared by all stages (default: CPU count)
+    - use_cache (bool): False recomputes everything without reading or writing the cache
+    - sources (list): Paths/globs of several extracts to ingest instead of path
+    - manifest (str): Manifest of extracts to ingest instead of path (see ingestion.load_cohort)
+
+    Returns:
+    - PipelineRunner: Use .result(stage) to get a stage's output
+    """
+    runner = PipelineRunner(build_stages(path, bins, sources, manifest), cache_dir, n_jobs, use_cache)
+    start = time.perf_counter()
+    status = runner.run(targets, force)
+    ran = [name for name, state in status.items() if state == 'ran']
+    print(f"🏁 Pipeline finished in {time.perf_counter() - start:.2f}s "
+          f"({len(ran)} ran, {len(status) - len(ran)} cached)")
+    return runner
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Run or re-run stages of the thyroid analysis pipeline")
+    parser.add_argument("stages", nargs="*", help="Target stages (default: all)")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Recompute these stages")
+    parser.add_argument("--list", action="store_true", help="Print the stage graph and exit")
+    parser.add_argument("--path", default=file_path)
+    parser.add_argument("--sources", nargs="+", default=None, metavar="GLOB",
+                        help="Ingest several Excel/CSV/Parquet extracts instead of --path")
+    parser.add_argument("--manifest", default=None, help="JSON/CSV manifest of extracts to ingest")
+    parser.add_argument("--bins", type=int, default=20)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--trace", metavar="JSONL", help="Append per-stage timing/memory records to this file")
+    parser.add_argument("--profile", nargs="+", default=[], metavar="STAGE",
+                        help="Run these instrumented stages under cProfile ('*' for all)")
+    parser.add_argument("--tracemalloc", nargs="+", default=[], metavar="STAGE",
+                        help="Record allocation peaks and top allocation sites for these stages")
+    args = parser.parse_args(argv)
+    if args.trace or args.profile or args.tracemalloc:
+        configure(args.trace, args.profile, args.tracemalloc)
+
+    if args.list:
+        for stage in PipelineRunner(build_stages(args.path, args.bins, args.sources, args.manifest)).stages.values():
+            inputs = ", ".join(stage.inputs) or "-"
+            print(f"{stage.name:<16} <- {inputs}{'' if stage.cache else '  (not cached)'}")
+        return
+    run_pipeline(args.stages or None, args.force, args.path, args.bins, args.cache_dir,
+                 args.n_jobs, not args.no_cache, args.sources, args.manifest)
+
+
+if __name__ == "__main__":
+    main()
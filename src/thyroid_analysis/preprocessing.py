@@ -3,10 +3,10 @@
 
 import pandas as pd
 import numpy as np
-from sklearn.impute import KNNImputer
-from sklearn.experimental import enable_iterative_imputer  # noqa: F401
-from sklearn.impute import IterativeImputer
 
+from .instrumentation import instrument
+
+@instrument
 def convert_thyroid_columns_to_numeric(df: pd.DataFrame) -> pd.DataFrame:
     thyroid_columns = [
         'first TSH', 'last TSH', 'first T4', 'last T4',
@@ -15,6 +15,7 @@ def convert_thyroid_columns_to_numeric(df: pd.DataFrame) -> pd.DataFrame:
     df[thyroid_columns] = df[thyroid_columns].apply(pd.to_numeric, errors='coerce')
     return df
 
+@instrument
 def enforce_column_types(df: pd.DataFrame) -> pd.DataFrame:
     df['Age'] = df['Age'].astype(int)
     df['Sex'] = df['Sex'].astype('category')
@@ -27,6 +28,7 @@ def enforce_column_types(df: pd.DataFrame) -> pd.DataFrame:
         df[col] = df[col].astype(float)
     return df
 
+@instrument
 def encode_categorical_columns(df: pd.DataFrame) -> pd.DataFrame:
     sex_mapping = {'Male': 0, 'Female': 1}
     smoking_mapping = {'No': 0, 'Passive': 1, 'Active': 2}
@@ -38,13 +40,15 @@ def encode_categorical_columns(df: pd.DataFrame) -> pd.DataFrame:
 
     return df
 
+@instrument
 def map_diagnostic_group_column(df: pd.DataFrame) -> pd.DataFrame:
-    from .diagnostic_mapping import diagnostic_mapping
-    df['Diagnostic Group'] = df['Dx'].map(diagnostic_mapping)
+    from .diagnostic_mapping import DiagnosisMapper
+    df['Diagnostic Group'] = DiagnosisMapper().map(df['Dx'])
     print("Diagnostic group counts:")
     print(df['Diagnostic Group'].value_counts())
     return df
 
+@instrument
 def encode_diagnostic_group_column(df: pd.DataFrame) -> pd.DataFrame:
     from .diagnostic_mapping import diagnostic_group_mapping
     df.loc[:, 'Diagnostic Group Code'] = df['Diagnostic Group'].map(diagnostic_group_mapping)
@@ -52,6 +56,7 @@ def encode_diagnostic_group_column(df: pd.DataFrame) -> pd.DataFrame:
     print(df['Diagnostic Group'].unique())
     return df
 
+@instrument
 def drop_irrelevant_columns(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     columns_to_drop = ['Info.ID', 'Name', 'Occupation', 'Indication']
     df = df.drop(columns=columns_to_drop, errors='ignore')
@@ -60,24 +65,253 @@ def drop_irrelevant_columns(df: pd.DataFrame, verbose: bool = True) -> pd.DataFr
         print(df.columns)
     return df
 
-def impute_missing_values_knn(df: pd.DataFrame, n_neighbors: int = 5) -> pd.DataFrame:
+@instrument
+def impute_missing_values_knn(df: pd.DataFrame, n_neighbors: int = 5, algorithm: str = 'dense') -> pd.DataFrame:
+    """
+    algorithm: 'dense' uses sklearn's KNNImputer (full distance matrix); 'blockwise' gives the
+    same estimates with bounded memory; 'ball_tree' / 'kd_tree' use an approximate tree index.
+    See imputation.impute_knn_scalable.
+    """
     numeric_columns = df.select_dtypes(include=[np.number]).columns
-    knn_imputer = KNNImputer(n_neighbors=n_neighbors)
     df_copy = df.copy()
-    df_copy[numeric_columns] = knn_imputer.fit_transform(df[numeric_columns])
+    if algorithm == 'dense':
+        from sklearn.impute import KNNImputer
+        knn_imputer = KNNImputer(n_neighbors=n_neighbors)
+        df_copy[numeric_columns] = knn_imputer.fit_transform(df[numeric_columns])
+    else:
+        from .imputation import impute_knn_scalable
+        index = None if algorithm == 'blockwise' else algorithm
+        df_copy[numeric_columns] = impute_knn_scalable(df[numeric_columns].to_numpy(dtype=float),
+                                                       n_neighbors=n_neighbors, index=index)
 
-    print("Missing values after KNN Imputation:")
-    print(df_copy.isnull().sum())
+    print(f"Missing values after KNN Imputation: {int(df_copy.isnull().sum().sum())}")
     return df_copy
 
+@instrument
 def impute_missing_values_mice(df: pd.DataFrame) -> pd.DataFrame:
+    from sklearn.experimental import enable_iterative_imputer  # noqa: F401
+    from sklearn.impute import IterativeImputer
     numeric_columns = df.select_dtypes(include=[np.number]).columns
     mice_imputer = IterativeImputer()
     df_copy = df.copy()
     df_copy[numeric_columns] = mice_imputer.fit_transform(df[numeric_columns])
 
-    print("Missing values after MICE Imputation:")
-    print(df_copy.isnull().sum())
+    print(f"Missing values after MICE Imputation: {int(df_copy.isnull().sum().sum())}")
     return df_copy
 
-    
+
+# =========== Compiled preprocessing plan ===========
+
+LAB_COLUMNS = ['first TSH', 'last TSH', 'first T4', 'last T4',
+               'first T3', 'last T3', 'first FT4', 'last FT4',
+               'first FT3', 'last FT3']
+CATEGORICAL_MAPPINGS = {
+    'Sex': {'Male': 0, 'Female': 1},
+    'Smoking': {'No': 0, 'Passive': 1, 'Active': 2},
+    'Marital status': {'single': 0, 'married': 1},
+}
+COLUMNS_TO_DROP = ['Info.ID', 'Name', 'Occupation', 'Indication']
+# Small integer codes that .map turns into float64 because of missing values
+CODE_COLUMNS = ['Smoking', 'Marital status', 'Diagnostic Group Code']
+
+
+class PreprocessingPlan:
+    """
+    The cleaning schema of `main()` compiled into one reusable fit/transform object.
+
+    Replaces the chain convert_thyroid_columns_to_numeric -> enforce_column_types ->
+    encode_categorical_columns -> map_diagnostic_group_column ->
+    encode_diagnostic_group_column -> drop_irrelevant_columns with a single pass that
+    builds every output column once and assembles the result frame in one step.
+    The input frame is never modified. Categorical encodings and the diagnosis
+    mappings are resolved in `fit` and reused by every later `transform`.
+
+    Parameters:
+    - lab_columns (list): Lab value columns coerced to float ('<0.01' etc. become NaN)
+    - categorical_mappings (dict): {column: {label: code}} encodings
+    - columns_to_drop (list): Identifier/free-text columns removed from the output
+    - diagnosis_fallback (bool): Classify diagnoses missing from diagnostic_mapping with the
+      fallback rules (see diagnostic_mapping.DiagnosisMapper); False keeps literal matches only
+    - compact (bool): Build each output column with a compact dtype (see compact_dtypes):
+      float32 labs, nullable Int8 codes, the smallest integer type for Age and a categorical
+      Diagnostic Group. The float64/object frame is never materialised.
+    - verbose (int): 0 = silent, 1 = one-line summary, 2 = full frequency tables
+    """
+
+    def __init__(self, lab_columns: list = None, categorical_mappings: dict = None,
+                 columns_to_drop: list = None, diagnosis_fallback: bool = True, compact: bool = False,
+                 verbose: int = 1):
+        self.lab_columns = list(lab_columns or LAB_COLUMNS)
+        self.categorical_mappings = dict(categorical_mappings or CATEGORICAL_MAPPINGS)
+        self.columns_to_drop = list(columns_to_drop or COLUMNS_TO_DROP)
+        self.diagnosis_fallback = diagnosis_fallback
+        self.compact = compact
+        self.verbose = verbose
+
+    @instrument
+    def fit(self, df: pd.DataFrame = None) -> "PreprocessingPlan":
+        """Compile the mappings. df is only used to check that the schema is present."""
+        from .diagnostic_mapping import DiagnosisMapper, diagnostic_mapping, diagnostic_group_mapping
+
+        self.diagnostic_mapping_ = dict(diagnostic_mapping)
+        self.diagnostic_group_mapping_ = dict(diagnostic_group_mapping)
+        self.diagnosis_mapper_ = DiagnosisMapper(self.diagnostic_mapping_, fallback=self.diagnosis_fallback)
+        self.required_columns_ = ['Age', 'Dx'] + self.lab_columns + list(self.categorical_mappings)
+        if df is not None:
+            self._check_columns(df)
+        return self
+
+    def _check_columns(self, df: pd.DataFrame):
+        missing = [col for col in self.required_columns_ if col not in df.columns]
+        if missing:
+            raise ValueError(f"Input is missing required columns: {missing}")
+
+    @instrument
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Apply the compiled plan to a raw frame and return the cleaned frame."""
+        if not hasattr(self, 'required_columns_'):
+            raise RuntimeError("PreprocessingPlan must be fitted before transform")
+        self._check_columns(df)
+
+        # Coerce the text-bearing lab columns in one to_numeric call over the flattened block;
+        # columns that are already numeric are taken as they are
+        numeric = [col for col in self.lab_columns if pd.api.types.is_numeric_dtype(df[col])]
+        mixed = [col for col in self.lab_columns if col not in numeric]
+        lab_values = {col: df[col].to_numpy(dtype=float) for col in numeric}
+        if mixed:
+            labs = df[mixed].to_numpy(dtype=object).ravel()
+            labs = pd.to_numeric(pd.Series(labs), errors='coerce').to_numpy(dtype=float)
+            labs = labs.reshape(len(df), len(mixed))
+            lab_values.update({col: labs[:, i] for i, col in enumerate(mixed)})
+
+        # Mapping a categorical only touches its categories, not every row
+        dx = df['Dx'].astype('category')
+        group = self.diagnosis_mapper_.map(dx)
+
+        columns = {}
+        for col in df.columns:
+            if col in self.columns_to_drop:
+                continue
+            if col in lab_values:
+                columns[col] = lab_values[col]
+            elif col in self.categorical_mappings:
+                columns[col] = df[col].astype('category').map(self.categorical_mappings[col])
+            elif col == 'Age':
+                columns[col] = df[col].astype(int)
+            elif col == 'Dx':
+                columns[col] = dx
+            else:
+                columns[col] = df[col]
+        columns['Diagnostic Group'] = group
+        columns['Diagnostic Group Code'] = group.map(self.diagnostic_group_mapping_)
+        if self.compact:
+            # Column by column, so only one float64 column exists next to its compact copy
+            dtypes = self.dtype_plan(columns)
+            columns = {col: _compact_column(pd.Series(values, index=df.index, copy=False), dtypes.get(col))
+                       for col, values in columns.items()}
+
+        out = pd.DataFrame(columns, index=df.index)
+        self._report(out, dx)
+        return out
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
+    def schema_fingerprint(self) -> str:
+        """Short hash of the compiled schema; artifacts fitted on this plan's output record it."""
+        import hashlib
+        import json
+
+        if not hasattr(self, 'required_columns_'):
+            raise RuntimeError("PreprocessingPlan must be fitted before fingerprinting")
+        schema = {
+            'lab_columns': self.lab_columns,
+            'categorical_mappings': self.categorical_mappings,
+            'columns_to_drop': self.columns_to_drop,
+            'diagnostic_mapping': self.diagnostic_mapping_,
+            'diagnostic_group_mapping': self.diagnostic_group_mapping_,
+            'diagnosis_rules': self.diagnosis_mapper_.rules if self.diagnosis_fallback else [],
+            'diagnosis_tokens': self.diagnosis_mapper_.tokens if self.diagnosis_fallback else {},
+        }
+        return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+    def dtype_plan(self, columns) -> dict:
+        """Compact dtypes for the plan's known columns; other columns follow compact_dtypes' defaults."""
+        plan = {col: 'float32' for col in self.lab_columns}
+        plan.update({col: 'Int8' for col in CODE_COLUMNS})
+        plan.update({'Dx': 'category', 'Diagnostic Group': 'category'})
+        return {col: dtype for col, dtype in plan.items() if col in columns}
+
+    def unmapped_diagnoses(self, df: pd.DataFrame) -> pd.Series:
+        """Row counts of the raw Dx values that map to no diagnostic group, largest first."""
+        if not hasattr(self, 'diagnosis_mapper_'):
+            raise RuntimeError("PreprocessingPlan must be fitted before unmapped_diagnoses")
+        return self.diagnosis_mapper_.unmapped(df['Dx'])
+
+    def _report(self, df: pd.DataFrame, dx: pd.Series):
+        if self.verbose >= 2:
+            print("Diagnostic group counts:")
+            print(df['Diagnostic Group'].value_counts())
+            print("\nUnmapped diagnoses:")
+            print(self.diagnosis_mapper_.unmapped(dx))
+            print("\nRemaining columns after preprocessing:")
+            print(df.columns)
+        elif self.verbose == 1:
+            unmapped = int(df['Diagnostic Group'].isna().sum())
+            size = df.memory_usage(deep=True).sum() / 2**20
+            print(f"Preprocessed {df.shape[0]} rows x {df.shape[1]} columns, {size:.2f} MB "
+                  f"({unmapped} rows with unmapped diagnosis)")
+
+
+# =========== Compact dtypes ===========
+
+def _compact_column(values: pd.Series, dtype=None) -> pd.Series:
+    if dtype is not None:
+        # A code column that is already categorical (e.g. Sex) keeps its categories
+        if dtype == 'Int8' and isinstance(values.dtype, pd.CategoricalDtype):
+            return values
+        return values.astype(dtype)
+    if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return values
+    if pd.api.types.is_integer_dtype(values.dtype) and not values.hasnans:
+        return pd.to_numeric(values, downcast='unsigned' if values.min() >= 0 else 'integer')
+    if pd.api.types.is_float_dtype(values.dtype):
+        return values.astype('float32')
+    if pd.api.types.is_object_dtype(values.dtype) or pd.api.types.is_string_dtype(values.dtype):
+        return values.astype('category')
+    return values
+
+
+@instrument
+def compact_dtypes(df: pd.DataFrame, dtypes: dict = None) -> pd.DataFrame:
+    """
+    Return a copy of a frame with compact dtypes, e.g. for imputed frames.
+
+    Parameters:
+    - df (pd.DataFrame): Frame to shrink
+    - dtypes (dict): Explicit {column: dtype}; for example PreprocessingPlan.dtype_plan(df)
+      ('Int8' is skipped for columns that are already categorical). Every other column:
+      float -> float32, integers without missing values -> the smallest integer type,
+      text -> category; categoricals and booleans are kept.
+
+    Returns:
+    - pd.DataFrame
+    """
+    dtypes = dtypes or {}
+    return pd.DataFrame({col: _compact_column(df[col], dtypes.get(col)) for col in df.columns}, index=df.index)
+
+
+def memory_report(frames: dict) -> pd.DataFrame:
+    """
+    Deep memory use in MB per column of each frame, with a Total row.
+
+    Parameters:
+    - frames (dict): {label: DataFrame}, e.g. {'default': df, 'compact': compact_dtypes(df)}
+
+    Returns:
+    - pd.DataFrame: One column per frame (NaN where a frame lacks the column)
+    """
+    report = pd.DataFrame({label: df.memory_usage(index=False, deep=True) / 2**20
+                           for label, df in frames.items()})
+    report.loc['Total'] = report.sum()
+    return report.round(3)
@@ -0,0 +1,168 @@
+# src/thyroid_analysis/rendering.py
+#
+# Headless figure rendering farm. Plotting code first describes each figure as a
+# FigureSpec (draw function + the data it needs + output path); render_figures then
+# draws the specs in a process pool on the Agg backend and skips figures whose
+# input data has not changed since the last run.
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Optional: Not available on Windows; manifests are then only locked within this process
+
+from .instrumentation import instrument
+from .utils import process_pool
+
+MANIFEST_NAME = ".render_manifest.json"
+
+# Bump when drawing code changes so every figure is re-rendered once
+RENDER_VERSION = 1
+
+# pyplot's current-figure state is global and not thread-safe; the pipeline runs
+# plotting stages on concurrent threads, so in-process drawing holds this lock
+PYPLOT_LOCK = threading.RLock()
+
+# Stages rendering into the same directory update its manifest under these locks
+_MANIFEST_LOCKS = {}
+_MANIFEST_LOCKS_GUARD = threading.Lock()
+
+
+@dataclass
+class FigureSpec:
+    """
+    One figure to render.
+
+    - draw: Module-level function draw(data, **params) that draws onto the current pyplot figure(s)
+    - data: Series/DataFrame with exactly the data the figure needs
+    - path: PNG path to save to
+    - params: Extra keyword arguments for draw (must be JSON-serialisable)
+    - savefig: Keyword arguments for plt.savefig
+    """
+    draw: Callable
+    data: object
+    path: str
+    params: dict = field(default_factory=dict)
+    savefig: dict = field(default_factory=dict)
+
+    def fingerprint(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{RENDER_VERSION}:{self.draw.__module__}.{self.draw.__qualname__}".encode())
+        digest.update(json.dumps([self.params, self.savefig], sort_keys=True, default=str).encode())
+        if isinstance(self.data, pd.DataFrame):
+            digest.update(json.dumps([str(c) for c in self.data.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(self.data, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render(spec: FigureSpec) -> str:
+    import matplotlib.pyplot as plt
+
+    os.makedirs(os.path.dirname(spec.path) or ".", exist_ok=True)
+    with PYPLOT_LOCK:
+        existing = set(plt.get_fignums())
+        spec.draw(spec.data, **spec.params)
+        plt.savefig(spec.path, **spec.savefig)
+        for num in set(plt.get_fignums()) - existing:
+            plt.close(num)
+    return spec.path
+
+
+@contextmanager
+def _manifest_lock(directory: str):
+    """Exclusive access to a directory's manifest, across threads and (with fcntl) processes."""
+    directory = os.path.abspath(directory)
+    with _MANIFEST_LOCKS_GUARD:
+        lock = _MANIFEST_LOCKS.setdefault(directory, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, MANIFEST_NAME + ".lock"), "w") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _update_manifest(directory: str, entries: dict):
+    """Merge entries into the manifest as it is on disk now, so concurrent renders into one directory keep each other's entries."""
+    with _manifest_lock(directory):
+        manifest = _load_manifest(directory)
+        manifest.update(entries)
+        path = os.path.join(directory, MANIFEST_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(path + ".tmp", path)
+
+
+def _load_manifest(directory: str) -> dict:
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+@instrument
+def render_figures(specs: list, n_jobs: int = None, skip_unchanged: bool = True) -> dict:
+    """
+    Render figure specs headlessly, in parallel.
+
+    Parameters:
+    - specs (list): FigureSpec objects
+    - n_jobs (int): Worker processes on the Agg backend (default: CPU count);
+      1 renders in this process with the current backend
+    - skip_unchanged (bool): Skip a figure when its PNG exists and its data/params hash
+      matches the one recorded in the directory's .render_manifest.json. Only the
+      entries of rendered figures are merged into the manifest, under a per-directory
+      lock, so concurrent calls rendering into one directory keep each other's entries
+
+    Returns:
+    - dict: {path: 'rendered' | 'skipped'}
+    """
+    manifests = {}
+    todo, status = [], {}
+    for spec in specs:
+        directory = os.path.dirname(spec.path) or "."
+        manifest = manifests.setdefault(directory, _load_manifest(directory))
+        key = os.path.basename(spec.path)
+        fingerprint = spec.fingerprint()
+        if skip_unchanged and manifest.get(key) == fingerprint and os.path.exists(spec.path):
+            status[spec.path] = "skipped"
+            continue
+        todo.append((spec, directory, key, fingerprint))
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(todo), 1))
+    if n_jobs <= 1:
+        paths = [_render(spec) for spec, *_ in todo]
+    else:
+        with process_pool(n_jobs, initializer=_use_agg) as pool:
+            paths = list(pool.map(_render, [spec for spec, *_ in todo]))
+
+    rendered_entries = {}
+    for (spec, directory, key, fingerprint), path in zip(todo, paths):
+        rendered_entries.setdefault(directory, {})[key] = fingerprint
+        status[path] = "rendered"
+    for directory, entries in rendered_entries.items():
+        _update_manifest(directory, entries)
+
+    rendered = sum(1 for s in status.values() if s == "rendered")
+    print(f"🖼️ Rendered {rendered} figures, skipped {len(status) - rendered} unchanged")
+    return status
@@ -0,0 +1,316 @@
+# src/thyroid_analysis/serving.py
+#
+# Warm inference for new patients: a persisted bundle (preprocessing plan, imputer,
+# classifier) is loaded once and serves single records and micro-batches. Concurrent
+# single-record requests are coalesced into one model call by MicroBatcher.
+#
+#     python -m thyroid_analysis.serving serve --bundle outputs/models/thyroid_bundle.joblib
+#     python -m thyroid_analysis.serving loadtest --bundle outputs/models/thyroid_bundle.joblib
+
+import argparse
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrument
+
+DEFAULT_BUNDLE_PATH = "outputs/models/thyroid_bundle.joblib"
+# Fields a record must carry; everything else the plan needs is treated as missing
+REQUIRED_FIELDS = ['Age']
+
+
+@instrument
+def save_bundle(plan, imputer, model, features: list, path: str = DEFAULT_BUNDLE_PATH) -> str:
+    """
+    Persist everything needed to score raw records.
+
+    Parameters:
+    - plan (PreprocessingPlan): Fitted preprocessing plan
+    - imputer (ImputerModel): Fitted imputer (see imputer_store)
+    - model: Fitted classifier/pipeline with predict_proba (e.g. modeling.build_pipeline(...).fit(...))
+    - features (list): Columns the model was trained on, in order
+    - path (str): Output file
+    """
+    import joblib
+    from .diagnostic_mapping import diagnostic_group_mapping
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    joblib.dump({
+        'plan': plan,
+        'imputer': imputer,
+        'model': model,
+        'features': list(features),
+        'labels': {code: group for group, code in diagnostic_group_mapping.items()},
+    }, path)
+    print(f"💾 Saved inference bundle to: {path}")
+    return path
+
+
+@instrument
+def fit_bundle(df_raw: pd.DataFrame, model_name: str = 'RandomForest', features: list = None,
+               imputer_method: str = 'knn', path: str = DEFAULT_BUNDLE_PATH, **imputer_params) -> str:
+    """
+    Fit the plan, imputer and classifier on the labelled raw workbook and save them as one bundle.
+
+    Parameters:
+    - df_raw (pd.DataFrame): Raw workbook rows
+    - model_name (str): Name from modeling.MODEL_ZOO
+    - features (list): Model inputs, e.g. the consensus biomarkers (default: every imputed column)
+    - imputer_method (str): 'knn' or 'mice'
+    - path (str): Output file
+
+    Returns:
+    - str: Path of the written bundle
+    """
+    from .imputer_store import ImputerModel
+    from .modeling import TARGET, build_pipeline
+    from .preprocessing import PreprocessingPlan
+
+    plan = PreprocessingPlan(verbose=0).fit(df_raw)
+    df = plan.transform(df_raw)
+    imputer = ImputerModel(imputer_method, schema=plan.schema_fingerprint(), **imputer_params).fit(df)
+    df = imputer.transform(df).dropna(subset=[TARGET])
+    features = list(features or imputer.columns)
+    model = build_pipeline(model_name).fit(df[features].to_numpy(dtype=float), df[TARGET].to_numpy().astype(int))
+    return save_bundle(plan, imputer, model, features, path)
+
+
+def validate_record(record) -> dict:
+    """
+    Check one raw record before it is scored.
+
+    Parameters:
+    - record: Request payload for one patient
+
+    Returns:
+    - dict: The record, unchanged
+
+    Raises:
+    - ValueError: The record is not an object, or a REQUIRED_FIELDS value is missing or not a number
+    """
+    if not isinstance(record, dict):
+        raise ValueError(f"A record must be a JSON object, got {type(record).__name__}")
+    for field in REQUIRED_FIELDS:
+        value = record.get(field)
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            number = np.nan
+        if not np.isfinite(number):
+            raise ValueError(f"Record field '{field}' is required and must be a number, got {value!r}")
+    return record
+
+
+class ThyroidPredictor:
+    """Scores raw patient records with a loaded bundle. Load once, call many times."""
+
+    def __init__(self, bundle: dict):
+        self.plan = bundle['plan']
+        self.plan.verbose = 0
+        self.imputer = bundle['imputer']
+        self.model = bundle['model']
+        self.features = bundle['features']
+        self.labels = bundle['labels']
+        self.classes = [int(c) for c in getattr(self.model, 'classes_', [])]
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_BUNDLE_PATH) -> "ThyroidPredictor":
+        import joblib
+        return cls(joblib.load(path))
+
+    @instrument
+    def predict_batch(self, records: list) -> list:
+        """
+        Score a list of raw records (dicts with the workbook's column names).
+        Columns the plan needs but a record lacks, such as 'Dx' for a new patient, are
+        treated as missing; REQUIRED_FIELDS are checked by validate_record.
+        """
+        for i, record in enumerate(records):
+            try:
+                validate_record(record)
+            except ValueError as error:
+                raise ValueError(f"Record {i}: {error}" if len(records) > 1 else str(error)) from None
+        raw = pd.DataFrame.from_records(records)
+        for col in self.plan.required_columns_:
+            if col not in raw.columns:
+                raw[col] = np.nan
+        # Row by row, so a record gets the same answer alone or in a coalesced batch
+        df = self.imputer.transform(self.plan.transform(raw), per_row=True)
+        probabilities = self.model.predict_proba(df[self.features].to_numpy(dtype=float))
+        results = []
+        for row in probabilities:
+            code = self.classes[int(np.argmax(row))]
+            results.append({
+                'code': code,
+                'group': self.labels.get(code),
+                'probabilities': {self.labels.get(c, str(c)): float(p) for c, p in zip(self.classes, row)},
+            })
+        return results
+
+    def predict_one(self, record: dict) -> dict:
+        return self.predict_batch([record])[0]
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-record requests: a background thread collects requests
+    for up to max_wait_ms (or until max_batch are queued) and scores them in one call.
+    If that call fails, the records are scored one by one so a bad record only fails
+    its own request.
+    """
+
+    def __init__(self, predictor: ThyroidPredictor, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.predictor = predictor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> Future:
+        future = Future()
+        self._queue.put((record, future))
+        return future
+
+    def predict(self, record: dict, timeout: float = None) -> dict:
+        return self.submit(record).result(timeout)
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                results = self.predictor.predict_batch([record for record, _ in batch])
+            except Exception as error:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(error)
+                else:
+                    self._score_each(batch)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _score_each(self, batch: list):
+        for record, future in batch:
+            try:
+                future.set_result(self.predictor.predict_one(record))
+            except Exception as error:
+                future.set_exception(error)
+
+
+def create_app(predictor: ThyroidPredictor, batcher: MicroBatcher = None):
+    """
+    Flask app with POST /predict (one record object, or a list of records scored as one
+    batch) and GET /health. Records failing validate_record get HTTP 400.
+    """
+    from flask import Flask, jsonify, request
+
+    batcher = batcher or MicroBatcher(predictor)
+    app = Flask(__name__)
+
+    @app.route("/health")
+    def health():
+        return jsonify({'status': 'ok', 'features': predictor.features})
+
+    @app.route("/predict", methods=["POST"])
+    def predict():
+        payload = request.get_json(force=True, silent=True)
+        records = payload if isinstance(payload, list) else [payload]
+        try:
+            if payload is None or not records:
+                raise ValueError("Expected a JSON record object or a non-empty list of records")
+            for i, record in enumerate(records):
+                try:
+                    validate_record(record)
+                except ValueError as error:
+                    raise ValueError(f"Record {i}: {error}" if isinstance(payload, list) else str(error)) from None
+        except ValueError as error:
+            return jsonify({'error': str(error)}), 400
+        if isinstance(payload, list):
+            return jsonify(predictor.predict_batch(payload))
+        return jsonify(batcher.predict(payload))
+
+    return app
+
+
+def run_load_test(predict, records: list, n_requests: int = 1000, concurrency: int = 16) -> dict:
+    """
+    Fire n_requests single-record calls from `concurrency` client threads.
+
+    Parameters:
+    - predict (callable): record -> result, e.g. MicroBatcher.predict, ThyroidPredictor.predict_one,
+      or an HTTP client function
+    - records (list): Records to cycle through
+    - n_requests (int): Total calls
+    - concurrency (int): Parallel clients
+
+    Returns:
+    - dict: p50/p99/mean latency in ms and throughput in requests per second
+    """
+    def timed(i):
+        start = time.perf_counter()
+        predict(records[i % len(records)])
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(timed, range(n_requests)))) * 1000
+    elapsed = time.perf_counter() - start
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'throughput_rps': n_requests / elapsed,
+    }
+
+
+def _sample_records(n: int = 200) -> list:
+    """Raw records from the bundled workbook, without identifiers or the diagnosis."""
+    from .pipeline import load_default_dataset
+
+    raw = load_default_dataset().drop(columns=['Dx', 'Info.ID', 'Name'], errors='ignore').head(n)
+    return [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in raw.to_dict('records')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thyroid diagnostic group inference service")
+    parser.add_argument("command", choices=["serve", "loadtest"])
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    predictor = ThyroidPredictor.load(args.bundle)
+    batcher = MicroBatcher(predictor, args.max_batch, args.max_wait_ms)
+    if args.command == "serve":
+        create_app(predictor, batcher).run(host=args.host, port=args.port, threaded=True)
+        return
+
+    records = _sample_records()
+    for name, predict in [("single-record", predictor.predict_one), ("coalesced", batcher.predict)]:
+        report = run_load_test(predict, records, args.requests, args.concurrency)
+        print(f"{name:>13}: p50={report['p50_ms']:.2f}ms p99={report['p99_ms']:.2f}ms "
+              f"throughput={report['throughput_rps']:.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
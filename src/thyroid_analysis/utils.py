@@ -1,5 +1,103 @@
 # src/thyroid_analysis/utils.py
 
+import multiprocessing
+import re
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
 def inspect_head(df, rows=20):
     """Print the first few rows of the dataframe."""
     print(df.head(rows))
+
+def measure_import_time(module: str) -> float:
+    """
+    Import a module in a fresh interpreter and return its cumulative import time in seconds,
+    as reported by `python -X importtime`.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    # Lines look like: "import time:   self [us] | cumulative | imported package"
+    pattern = re.compile(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*" + re.escape(module) + r"\s*$")
+    for line in result.stderr.splitlines():
+        match = pattern.match(line)
+        if match:
+            return int(match.group(1)) / 1e6
+    raise RuntimeError(f"No import timing found for '{module}'")
+
+def check_import_budget(budgets: dict) -> dict:
+    """
+    Fail when a module's cold import exceeds its budget.
+
+    Parameters:
+    - budgets (dict): {module name: budget in seconds}
+
+    Returns:
+    - dict: {module name: measured seconds}
+    """
+    timings = {module: measure_import_time(module) for module in budgets}
+    over = {m: t for m, t in timings.items() if t > budgets[m]}
+    if over:
+        details = ", ".join(f"{m}: {t:.3f}s > {budgets[m]:.3f}s" for m, t in over.items())
+        raise AssertionError(f"Import time budget exceeded ({details})")
+    return timings
+
+def share_array(array: np.ndarray):
+    """
+    Copy an array into a new shared-memory block so worker processes can read it without pickling.
+
+    Returns:
+    - tuple: (SharedMemory handle, spec) where spec = (block name, shape, dtype str) is
+      what workers pass to attach_shared_array. The caller must close() and unlink() the handle.
+    """
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+def attach_shared_array(spec):
+    """
+    Attach to an array created by share_array. Returns (SharedMemory handle, read-only view);
+    keep the handle alive while the view is in use and close() it afterwards.
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    view.flags.writeable = False
+    return shm, view
+
+def process_pool(max_workers: int, **kwargs) -> ProcessPoolExecutor:
+    """
+    ProcessPoolExecutor whose workers are started by a forkserver (spawn where there is
+    none), never forked from this process. The pipeline creates pools from its stage
+    threads, and a child forked while another thread holds a lock (import, logging,
+    pyplot) can deadlock. The server preloads numpy and pandas so workers start warm.
+
+    Parameters:
+    - max_workers (int): Worker processes
+    - kwargs: Other ProcessPoolExecutor arguments (initializer, ...)
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    if method == 'forkserver':
+        context.set_forkserver_preload(['numpy', 'pandas'])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, **kwargs)
+
+# Cold-start budgets for the package entry points, enforced by tests/test_import_budget.py;
+# numpy/pandas are the only eager heavy imports
+IMPORT_BUDGETS = {
+    "thyroid_analysis.config": 0.05,
+    "thyroid_analysis.modeling": 1.0,
+    "thyroid_analysis.pipeline": 1.0,
+    "thyroid_analysis.preprocessing": 1.0,
+}
+
+if __name__ == "__main__":
+    for name, seconds in check_import_budget(IMPORT_BUDGETS).items():
+        print(f"✅ {name}: {seconds:.3f}s (budget {IMPORT_BUDGETS[name]:.3f}s)")
@@ -0,0 +1,28 @@
+# tests/conftest.py
+#
+# The package is run from src/ without being installed; make it importable here and in
+# the interpreters the tests start.
+
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+sys.path.insert(0, SRC)
+os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [SRC, os.environ.get("PYTHONPATH")]))
+
+WORKBOOK = os.path.join(os.path.dirname(SRC), "data", "ExactRealDatasetLU.xlsx")
+
+
+@pytest.fixture(scope="session")
+def workbook_df():
+    from thyroid_analysis.data_loader import load_excel_dataset
+    return load_excel_dataset(WORKBOOK, use_cache=False)
+
+
+@pytest.fixture
+def raw_df(workbook_df):
+    """A fresh copy of the reference cohort workbook, as loaded by the pipeline."""
+    return workbook_df.copy()
@@ -0,0 +1,61 @@
+# tests/test_data_loader.py
+
+import datetime
+import os
+import shutil
+
+import pandas as pd
+
+from thyroid_analysis.data_loader import load_excel_dataset
+
+
+def test_unstorable_column_is_returned_uncached(tmp_path, capsys):
+    workbook = str(tmp_path / "cohort.xlsx")
+    pd.DataFrame({
+        'Age': [30, 41, 52],
+        # Dates mixed with text: the text part still holds datetimes Arrow cannot store next to str
+        'Visit': [datetime.datetime(2024, 1, 5), 'unknown', datetime.datetime(2024, 3, 1)],
+    }).to_excel(workbook, sheet_name='Sheet1', index=False)
+    cache_dir = str(tmp_path / "cache")
+
+    df = load_excel_dataset(workbook, cache_dir=cache_dir)
+
+    assert df['Age'].tolist() == [30, 41, 52]
+    assert df['Visit'].tolist()[1] == 'unknown'
+    assert "Not caching" in capsys.readouterr().out
+    cached = os.listdir(cache_dir) if os.path.isdir(cache_dir) else []
+    assert not [name for name in cached if name.endswith((".arrow", ".tmp"))]
+
+
+def test_cached_load_matches_a_fresh_parse(tmp_path):
+    from conftest import WORKBOOK
+
+    workbook = str(tmp_path / "cohort.xlsx")
+    shutil.copyfile(WORKBOOK, workbook)
+    cache_dir = str(tmp_path / "cache")
+
+    parsed = load_excel_dataset(workbook, use_cache=False)
+    first = load_excel_dataset(workbook, cache_dir=cache_dir)
+    entries = os.listdir(cache_dir)
+    cached = load_excel_dataset(workbook, cache_dir=cache_dir)
+
+    assert len(entries) == 1
+    pd.testing.assert_frame_equal(first, parsed)
+    # Mixed text/number lab columns come back as the same object values
+    pd.testing.assert_frame_equal(cached, parsed)
+
+
+def test_changed_workbook_replaces_its_cache_entry(tmp_path):
+    workbook = str(tmp_path / "cohort.xlsx")
+    cache_dir = str(tmp_path / "cache")
+    pd.DataFrame({'Age': [30, 41], 'first TSH': [1.2, '<0.01']}).to_excel(workbook, index=False)
+    load_excel_dataset(workbook, cache_dir=cache_dir)
+    before = os.listdir(cache_dir)
+
+    pd.DataFrame({'Age': [30, 41, 52], 'first TSH': [1.2, '<0.01', 3.4]}).to_excel(workbook, index=False)
+    df = load_excel_dataset(workbook, cache_dir=cache_dir)
+
+    assert df['Age'].tolist() == [30, 41, 52]
+    assert df['first TSH'].tolist() == [1.2, '<0.01', 3.4]
+    after = os.listdir(cache_dir)
+    assert len(after) == 1 and after != before
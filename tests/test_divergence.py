@@ -0,0 +1,79 @@
+# tests/test_divergence.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from thyroid_analysis.divergence_sketch import streaming_divergences
+from thyroid_analysis.KL_divergence import calculate_kl_divergence, compute_divergences
+
+COLUMNS = ['TSH', 'FT4', 'Age']
+METRICS = ('kl', 'js', 'wasserstein')
+
+
+@pytest.fixture(scope="module")
+def variants():
+    rng = np.random.default_rng(0)
+    original = pd.DataFrame(rng.normal(size=(1000, 3)), columns=COLUMNS)
+    original[original > 1.5] = np.nan
+    knn = original.fillna(0.1)
+    mice = original.fillna(original.mean() + rng.normal(scale=0.5, size=3))
+    return original, {'KNN': knn, 'MICE': mice}
+
+
+def _shards(df, directory, name, n, suffix):
+    paths = []
+    for i, rows in enumerate(np.array_split(np.arange(len(df)), n)):
+        part = df.iloc[rows]
+        path = str(directory / f"{name}_{i}{suffix}")
+        part.to_csv(path, index=False) if suffix == ".csv" else part.to_parquet(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def _chunked(df, size=128):
+    return lambda: (df.iloc[start:start + size] for start in range(0, len(df), size))
+
+
+def _assert_same_table(result, expected):
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_exact=False, rtol=1e-9, atol=1e-12)
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_sharded_files_match_in_memory(variants, tmp_path, suffix):
+    original, imputed = variants
+    expected = compute_divergences(original, imputed, COLUMNS, metrics=METRICS)
+    result = streaming_divergences(
+        _shards(original, tmp_path, "original", 3, suffix),
+        {m: _shards(df, tmp_path, m, 2, suffix) for m, df in imputed.items()},
+        COLUMNS, metrics=METRICS, chunksize=100, n_jobs=1,
+    )
+    _assert_same_table(result, expected)
+
+
+def test_parallel_shards_match_in_memory(variants, tmp_path):
+    original, imputed = variants
+    expected = compute_divergences(original, imputed, COLUMNS, metrics=METRICS)
+    result = streaming_divergences(
+        _shards(original, tmp_path, "original", 2, ".parquet"),
+        {m: _shards(df, tmp_path, m, 2, ".parquet") for m, df in imputed.items()},
+        COLUMNS, metrics=METRICS, n_jobs=2,
+    )
+    _assert_same_table(result, expected)
+
+
+def test_chunk_callables_match_in_memory(variants):
+    original, imputed = variants
+    expected = compute_divergences(original, imputed, COLUMNS, metrics=METRICS)
+    result = streaming_divergences(_chunked(original), {m: _chunked(df) for m, df in imputed.items()},
+                                   COLUMNS, metrics=METRICS, n_jobs=1)
+    _assert_same_table(result, expected)
+
+
+def test_single_variant_kl_matches_the_per_column_helper(variants):
+    original, imputed = variants
+    table = compute_divergences(original, {'KNN': imputed['KNN']}, COLUMNS)
+    for col in COLUMNS:
+        value = table.loc[table['Feature'] == col, 'Value'].item()
+        assert value == pytest.approx(calculate_kl_divergence(original[col], imputed['KNN'][col]), abs=1e-15)
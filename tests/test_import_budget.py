@@ -0,0 +1,20 @@
+# tests/test_import_budget.py
+#
+# Startup regression guard: each entry point in IMPORT_BUDGETS must import cold, in a
+# fresh interpreter, within its budget.
+
+import pytest
+
+from thyroid_analysis.utils import IMPORT_BUDGETS, measure_import_time
+
+# Best of a few runs, after one run that writes the bytecode caches, so a single slow
+# start on a busy machine does not fail the suite
+RUNS = 3
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_within_budget(module):
+    measure_import_time(module)
+    seconds = min(measure_import_time(module) for _ in range(RUNS))
+    assert seconds <= IMPORT_BUDGETS[module], \
+        f"import {module} took {seconds:.3f}s, budget {IMPORT_BUDGETS[module]:.3f}s"
@@ -0,0 +1,32 @@
+# tests/test_imputation.py
+
+import numpy as np
+import pytest
+from sklearn.impute import KNNImputer
+
+from thyroid_analysis.imputation import impute_knn_scalable
+
+
+def _with_gaps(rows=300, cols=6, rate=0.15, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, cols))
+    X[rng.random(X.shape) < rate] = np.nan
+    return X
+
+
+@pytest.mark.parametrize("block_rows, block_donors", [(1024, 16384), (37, 53)])
+def test_blockwise_knn_matches_sklearn(block_rows, block_donors):
+    # Continuous random values, so there are no distance ties between donors
+    X = _with_gaps()
+    expected = KNNImputer(n_neighbors=5).fit_transform(X)
+    result = impute_knn_scalable(X, n_neighbors=5, block_rows=block_rows, block_donors=block_donors)
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
+
+
+def test_all_nan_columns_are_dropped_like_sklearn():
+    X = _with_gaps(rows=80, cols=4, seed=1)
+    X[:, 2] = np.nan
+    expected = KNNImputer(n_neighbors=3).fit_transform(X)
+    result = impute_knn_scalable(X, n_neighbors=3, block_rows=16, block_donors=16)
+    assert result.shape == expected.shape
+    np.testing.assert_allclose(result, expected, rtol=0, atol=1e-12)
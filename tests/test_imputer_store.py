@@ -0,0 +1,40 @@
+# tests/test_imputer_store.py
+
+import numpy as np
+import pandas as pd
+
+from thyroid_analysis.imputer_store import impute_incremental, load_imputer
+
+
+def _batch(seed, columns=('Age', 'first TSH', 'last TSH'), shift=0.0, n=400):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(50, 10, size=(n, len(columns))) + shift, columns=list(columns))
+    df = df.mask(rng.random(df.shape) < 0.1)
+    df['Diagnostic Group Code'] = rng.integers(0, 3, n)
+    return df
+
+
+def test_incremental_reuse_drift_refit_and_schema_change(tmp_path):
+    store = str(tmp_path)
+
+    imputed, report = impute_incremental(_batch(0), 'knn', store, drift_threshold=0.5, schema='s1')
+    assert report['refitted'] and report['version'] == 1
+    assert not imputed[['Age', 'first TSH', 'last TSH']].isna().any().any()
+
+    _, report = impute_incremental(_batch(1), 'knn', store, drift_threshold=0.5, schema='s1')
+    assert not report['refitted'] and report['version'] == 1
+
+    _, report = impute_incremental(_batch(2, shift=40.0), 'knn', store, drift_threshold=0.5, schema='s1')
+    assert report['refitted'] and report['version'] == 2
+    assert load_imputer('knn', store).columns == ['Age', 'first TSH', 'last TSH']
+
+    # New schema: a lab column was added and one dropped; the refit follows the batch
+    changed = _batch(3, columns=('Age', 'first TSH', 'first FT4'))
+    imputed, report = impute_incremental(changed, 'knn', store, drift_threshold=0.5, schema='s2')
+    model = load_imputer('knn', store, schema='s2')
+    assert report['refitted'] and report['version'] == 3
+    assert model.columns == ['Age', 'first TSH', 'first FT4']
+    assert not imputed[model.columns].isna().any().any()
+
+    _, report = impute_incremental(_batch(4, columns=('Age', 'first TSH', 'first FT4')), 'knn', store, drift_threshold=0.5, schema='s2')
+    assert not report['refitted'] and report['version'] == 3
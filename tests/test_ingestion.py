@@ -0,0 +1,43 @@
+# tests/test_ingestion.py
+
+import pandas as pd
+
+from thyroid_analysis.ingestion import RAW_COLUMNS, deduplicate_patients, load_cohort
+
+
+def _extract(path, rows):
+    frame = pd.DataFrame([{col: None for col in RAW_COLUMNS} | row for row in rows])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_repeated_ids_within_a_source_are_never_merged(tmp_path):
+    january = _extract(tmp_path / "site_a" / "2024-01.csv", [
+        {'Info.ID': 7, 'Name': 'P1', 'Age': 30, 'Dx': 'Euthyroid'},
+        {'Info.ID': 7, 'Name': 'P2', 'Age': 52, 'Dx': 'Hypothyroid'},
+        {'Info.ID': 7, 'Name': 'P3', 'Age': 64, 'Dx': 'Euthyroid'},
+        {'Info.ID': 8, 'Name': 'P4', 'Age': 41, 'Dx': 'Euthyroid'},
+    ])
+    february = _extract(tmp_path / "site_a" / "2024-02.csv", [
+        {'Info.ID': 7, 'Name': 'P5', 'Age': 25, 'Dx': 'Euthyroid'},
+        {'Info.ID': 8, 'Name': 'P4', 'Age': 41, 'Dx': 'Hyperthyroid'},
+    ])
+
+    df = load_cohort([january, february], executor='thread', verbose=False)
+
+    # ID 7 repeats inside January, so it identifies nobody: all four rows stay.
+    # ID 8 is unique in both extracts: only February's row stays.
+    assert sorted(df['Name']) == ['P1', 'P2', 'P3', 'P4', 'P5']
+    assert df.loc[df['Name'] == 'P4', 'Dx'].tolist() == ['Hyperthyroid']
+
+
+def test_repeated_workbook_ids_survive_a_later_extract(raw_df):
+    raw_df['Site'], raw_df['Source'] = 'site', 'full'
+    counts = raw_df['Info.ID'].value_counts()
+    repeated_id = counts.index[0]
+    assert counts.iloc[0] > 1
+    later = raw_df[raw_df['Info.ID'] == repeated_id].head(1).assign(Source='later')
+    df = pd.concat([raw_df, later], ignore_index=True)
+
+    assert len(deduplicate_patients(df, keep='last')) == len(df)
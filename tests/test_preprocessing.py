@@ -0,0 +1,42 @@
+# tests/test_preprocessing.py
+
+import pandas as pd
+
+from thyroid_analysis.preprocessing import (
+    PreprocessingPlan, convert_thyroid_columns_to_numeric, drop_irrelevant_columns,
+    encode_categorical_columns, encode_diagnostic_group_column, enforce_column_types,
+    map_diagnostic_group_column,
+)
+
+
+def _old_chain(df):
+    df = convert_thyroid_columns_to_numeric(df)
+    df = enforce_column_types(df)
+    df = encode_categorical_columns(df)
+    df = map_diagnostic_group_column(df)
+    df = encode_diagnostic_group_column(df)
+    return drop_irrelevant_columns(df, verbose=False)
+
+
+def test_plan_matches_the_step_chain(raw_df):
+    expected = _old_chain(raw_df.copy())
+    result = PreprocessingPlan(verbose=0).fit_transform(raw_df)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_plan_leaves_its_input_untouched(raw_df):
+    before = raw_df.copy()
+    PreprocessingPlan(verbose=0).fit_transform(raw_df)
+    pd.testing.assert_frame_equal(raw_df, before)
+
+
+def test_compact_plan_holds_the_same_values(raw_df):
+    full = PreprocessingPlan(verbose=0).fit_transform(raw_df)
+    compact = PreprocessingPlan(verbose=0, compact=True).fit_transform(raw_df)
+    assert compact.memory_usage(deep=True).sum() < full.memory_usage(deep=True).sum()
+    for col in full.columns:
+        if pd.api.types.is_numeric_dtype(full[col]):
+            pd.testing.assert_series_equal(compact[col].astype(float), full[col].astype(float),
+                                           check_exact=False, rtol=1e-6)
+        else:
+            assert compact[col].astype(object).equals(full[col].astype(object)), col
@@ -0,0 +1,49 @@
+# tests/test_rendering.py
+
+import json
+import os
+import threading
+
+import pandas as pd
+
+from thyroid_analysis import rendering
+from thyroid_analysis.rendering import MANIFEST_NAME, FigureSpec, render_figures
+
+
+def draw_line(data):
+    import matplotlib.pyplot as plt
+    plt.figure()
+    plt.plot(data.to_numpy())
+
+
+def _specs(directory, names):
+    return [FigureSpec(draw_line, pd.Series(range(i + 3)), os.path.join(directory, f"{name}.png"))
+            for i, name in enumerate(names)]
+
+
+def test_concurrent_renders_into_one_directory_keep_all_manifest_entries(tmp_path, monkeypatch):
+    # Both calls read the (empty) manifest before either writes, as two pipeline
+    # stages rendering into outputs/eda/imputed at the same time do
+    barrier = threading.Barrier(2)
+    calls = []
+    load = rendering._load_manifest
+
+    def load_together(directory):
+        calls.append(directory)
+        if len(calls) <= 2:
+            barrier.wait(timeout=30)
+        return load(directory)
+
+    monkeypatch.setattr(rendering, "_load_manifest", load_together)
+    batches = [_specs(tmp_path, ["before"]), _specs(tmp_path, ["after_knn", "after_mice"])]
+    threads = [threading.Thread(target=render_figures, args=(specs,), kwargs={'n_jobs': 1}) for specs in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(tmp_path / MANIFEST_NAME) as f:
+        assert sorted(json.load(f)) == ["after_knn.png", "after_mice.png", "before.png"]
+    monkeypatch.undo()
+    status = render_figures(batches[0] + batches[1], n_jobs=1)
+    assert set(status.values()) == {"skipped"}
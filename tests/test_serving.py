@@ -0,0 +1,66 @@
+# tests/test_serving.py
+
+import pandas as pd
+import pytest
+
+from thyroid_analysis.serving import MicroBatcher, ThyroidPredictor, create_app, fit_bundle, validate_record
+
+
+@pytest.fixture(scope="module")
+def predictor(workbook_df, tmp_path_factory):
+    path = fit_bundle(workbook_df.copy(), model_name='RandomForest',
+                      path=str(tmp_path_factory.mktemp("bundle") / "bundle.joblib"))
+    return ThyroidPredictor.load(path)
+
+
+@pytest.fixture(scope="module")
+def records(workbook_df):
+    raw = workbook_df.drop(columns=['Dx', 'Info.ID', 'Name']).head(120)
+    return [{k: (None if pd.isna(v) else v) for k, v in row.items()} for row in raw.to_dict('records')]
+
+
+def test_batch_matches_single_records(predictor, records):
+    assert predictor.predict_batch(records) == [predictor.predict_one(r) for r in records]
+
+
+def test_micro_batcher_matches_single_records(predictor, records):
+    batcher = MicroBatcher(predictor, max_batch=32, max_wait_ms=50)
+    futures = [batcher.submit(record) for record in records]
+    assert [future.result(timeout=60) for future in futures] == [predictor.predict_one(r) for r in records]
+
+
+@pytest.mark.parametrize("record", [None, [1, 2], {}, {'Age': None}, {'Age': 'old'}, {'Age': float('nan')}])
+def test_validate_record_rejects_bad_records(record):
+    with pytest.raises(ValueError):
+        validate_record(record)
+
+
+def test_validate_record_accepts_numeric_strings():
+    record = {'Age': '47', 'first TSH': None}
+    assert validate_record(record) is record
+
+
+def test_invalid_record_does_not_fail_its_batch(predictor, records):
+    batcher = MicroBatcher(predictor, max_batch=8, max_wait_ms=200)
+    futures = [batcher.submit(r) for r in records[:3]] + [batcher.submit({'first TSH': 1.0})]
+    assert [future.result(timeout=60) for future in futures[:3]] == [predictor.predict_one(r) for r in records[:3]]
+    with pytest.raises(ValueError):
+        futures[3].result(timeout=60)
+
+
+def test_predict_endpoint_returns_400_for_bad_input(predictor, records):
+    client = create_app(predictor).test_client()
+    assert client.post("/predict", json={'first TSH': 1.0}).status_code == 400
+    assert client.post("/predict", json=[records[0], {'Age': None}]).status_code == 400
+    assert client.post("/predict", json=[]).status_code == 400
+    response = client.post("/predict", data="not json", content_type="application/json")
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_predict_endpoint_scores_valid_input(predictor, records):
+    client = create_app(predictor).test_client()
+    single = client.post("/predict", json=records[0])
+    batch = client.post("/predict", json=records[:2])
+    assert single.status_code == 200 and batch.status_code == 200
+    assert batch.get_json() == predictor.predict_batch(records[:2])